@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker pool shared by every batch request handled by this process. It is
+# created lazily so single-statement requests never pay for it.
+_pool = None
+_pool_failed = False
+
+
+def pool_size():
+    workers = os.environ.get('STATEMENT_WORKERS')
+    if workers:
+        return max(1, int(workers))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def render_pool():
+    global _pool, _pool_failed
+    if _pool is None and not _pool_failed:
+        try:
+            _pool = ProcessPoolExecutor(max_workers=pool_size())
+        except (OSError, NotImplementedError):
+            # Some serverless sandboxes (no /dev/shm) cannot create the
+            # semaphores multiprocessing needs; render inline there.
+            _pool_failed = True
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def render_statement(payload, options=None):
+    # Runs inside a worker process, so everything it touches has to be
+    # importable from the top level and the result has to pickle.
+    from api.index import PDFGenerator
+    from api.ledger import get_ledger
+    from api.streams import PDFBuffer
+    try:
+        if isinstance(payload, Exception):
+            raise payload
+        if not isinstance(payload, dict):
+            raise ValueError("statement payload must be a JSON object")
+        buffer = PDFBuffer()
+        PDFGenerator(buffer, ledger=get_ledger(), **(options or {})).generate(payload)
+        return True, buffer.getvalue()
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def render_many(payloads, options=None, window=None):
+    # Yields (payload, (ok, pdf_bytes_or_error)) in input order. `payloads`
+    # may be any iterable; at most `window` statements are in flight, so a
+    # long stream never holds more than that many PDFs in memory. With
+    # enough cores a batch finishes in roughly the time of its slowest
+    # statement.
+    payloads = iter(payloads)
+    pool = render_pool() if pool_size() > 1 else None
+    if pool is None:
+        for payload in payloads:
+            yield payload, render_statement(payload, options)
+        return
+    window = window or pool_size() * 2
+    pending = deque()
+    try:
+        for payload in payloads:
+            pending.append((payload, pool.submit(render_statement, payload, options)))
+            if len(pending) >= window:
+                payload, future = pending[0]
+                result = future.result()
+                pending.popleft()
+                yield payload, result
+        while pending:
+            payload, future = pending[0]
+            result = future.result()
+            pending.popleft()
+            yield payload, result
+    except BrokenProcessPool:
+        # A worker died (OOM, signal); finish the rest inline and start a
+        # fresh pool for the next request.
+        _reset_pool()
+        for payload, _ in pending:
+            yield payload, render_statement(payload, options)
+        for payload in payloads:
+            yield payload, render_statement(payload, options)
+
+
+def parse_ndjson(lines):
+    # One statement per line; blank lines are skipped and a line that isn't
+    # valid JSON becomes a per-statement error instead of failing the stream.
+    # A body that breaks off mid-stream ends the batch with one final error.
+    number = 0
+    try:
+        for line in lines:
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"line {number}: {e}")
+    except ValueError as e:
+        yield ValueError(f"request body after line {number}: {e}")
+
+
+def statement_info(payload):
+    info = payload.get('statement_info', {}) if isinstance(payload, dict) else {}
+    return info if isinstance(info, dict) else {}
+
+
+def statement_filename(payload, index, used):
+    info = statement_info(payload)
+    parts = ['statement', str(info.get('truck_number') or index + 1)]
+    if info.get('date'):
+        parts.append(str(info['date']).replace('/', '-'))
+    stem = re.sub(r'[^A-Za-z0-9.-]+', '_', '_'.join(parts)).strip('._') or f"statement_{index + 1}"
+    name = f"{stem}.pdf"
+    n = 2
+    while name in used:
+        name = f"{stem}_{n}.pdf"
+        n += 1
+    used.add(name)
+    return name
+
+
+def build_zip(results, fileobj):
+    # Writes one PDF per successful statement plus manifest.json into a ZIP
+    # on `fileobj`, flushing after each entry so a streaming sink can send
+    # it on. `fileobj` doesn't need to be seekable. Returns the manifest.
+    manifest = {'count': 0, 'rendered': 0, 'failed': 0, 'statements': []}
+    used = set()
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for index, (payload, (ok, value)) in enumerate(results):
+            info = statement_info(payload)
+            entry = {
+                'index': index,
+                'truck_number': info.get('truck_number'),
+                'date': info.get('date'),
+                'filename': None,
+                'error': None,
+            }
+            if ok:
+                entry['filename'] = statement_filename(payload, index, used)
+                zf.writestr(entry['filename'], value)
+                manifest['rendered'] += 1
+            else:
+                entry['error'] = value
+                manifest['failed'] += 1
+            manifest['count'] += 1
+            manifest['statements'].append(entry)
+            fileobj.flush()
+        zf.writestr('manifest.json', json.dumps(manifest, indent=2))
+    return manifest
+
+
+def render_batch(payloads, options=None):
+    buffer = io.BytesIO()
+    manifest = build_zip(render_many(payloads, options), buffer)
+    return buffer.getvalue(), manifest
+
+
+def stream_batch(lines, fileobj, options=None):
+    # NDJSON in, ZIP out: each statement is parsed, rendered and written to
+    # `fileobj` as soon as it is ready.
+    return build_zip(render_many(parse_ndjson(lines), options), fileobj)
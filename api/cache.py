@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from api.resources import get_resources
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def canonical_payload(data, now=None):
+    # The payload exactly as the generator will see it: defaults that depend
+    # on the clock are filled in, so a statement without a date hashes
+    # differently tomorrow. The footer's "printed at" timestamp is not part
+    # of the key; a cached PDF keeps the time it was first rendered.
+    if not isinstance(data, dict):
+        return data
+    now = now or datetime.now()
+    data = dict(data)
+    info = data.get('statement_info', {})
+    info = dict(info) if isinstance(info, dict) else {}
+    if 'date' not in info:
+        info['date'] = now.strftime("%m/%d/%Y")
+    if not info.get('week_period'):
+        info['week_period'] = f"{now.strftime('%m.%d')}-{now.strftime('%m.%d')}"
+    data['statement_info'] = info
+    return data
+
+
+def cache_key(data, options=None, now=None):
+    key = {
+        'template': get_resources().fingerprint,
+        'options': options or {},
+        'payload': canonical_payload(data, now),
+    }
+    blob = json.dumps(key, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class PDFCache:
+    # Rendered PDFs keyed by cache_key(). Memory tier is LRU bounded by total
+    # bytes; the optional disk tier (one file per key) is unbounded and
+    # survives restarts, hits there are promoted back into memory.
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pdf')
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = f.read()
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            except OSError:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _remember(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'directory': self.directory,
+            }
+
+
+def etag_matches(header, etag):
+    # If-None-Match may be "*" or a comma separated list, possibly weak.
+    if not header:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # Configured from the environment on first use:
+    # STATEMENT_CACHE_BYTES (0 disables the memory tier), STATEMENT_CACHE_DIR.
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_bytes = int(os.environ.get('STATEMENT_CACHE_BYTES', DEFAULT_MAX_BYTES))
+                directory = os.environ.get('STATEMENT_CACHE_DIR') or None
+                _cache = PDFCache(max_bytes, directory)
+    return _cache
@@ -0,0 +1,84 @@
+# The "compact" output profile (?output=compact): the same statement with
+# fewer bytes, for bulk archival. On top of what every statement already
+# gets (Flate-compressed pages, the standard Helvetica fonts referenced by
+# name, never embedded), a compact statement
+#
+#   - stores page and form streams as binary Flate, without the ASCII85
+#     layer ReportLab adds by default (a quarter of every stream),
+#   - draws a copy of the logo downscaled to STATEMENT_COMPACT_LOGO_DPI
+#     (default 150) at its printed size, see api/resources.py,
+#   - drops drawing operators that don't change anything: a line width,
+#     colour, cap, join or dash re-set to the value already in effect, an
+#     identity "cm", the "T*" after each cell's text, and the separate
+#     path per table grid line (consecutive lines become one path with
+#     one stroke).
+#
+# bench/sizes.py reports the size of both profiles for the benchmark
+# payloads.
+import re
+
+from reportlab.pdfbase.pdfdoc import PDFFormXObject, PDFPage, PDFStream, PDFZCompress
+
+OUTPUTS = ('standard', 'compact')
+
+# Graphics state operators that only set a value, keyed by operator.
+STATE_OPERATORS = frozenset(('w', 'J', 'j', 'M', 'd', 'RG', 'rg', 'G', 'g', 'K', 'k'))
+# Operators that change state in a way the tracking below doesn't follow.
+UNTRACKED_OPERATORS = frozenset(('gs', 'CS', 'cs', 'SC', 'sc', 'SCN', 'scn'))
+
+# One canvas.line() call: "n x1 y1 m x2 y2 l S".
+LINE = re.compile(r'n (\S+ \S+ m \S+ \S+ l) S$')
+TEXT_NEXT_LINE = ' T* ET'
+
+
+def compact_operators(code):
+    # The content stream lines of one page (canvas._code) without the
+    # redundant operators described above; the page looks the same.
+    out = []
+    state = {}
+    stack = []
+    segments = []
+    for op in code:
+        match = LINE.match(op)
+        if match:
+            segments.append(match.group(1))
+            continue
+        if segments:
+            out.append(' '.join(segments) + ' S')
+            segments = []
+        if op == 'q':
+            stack.append(dict(state))
+        elif op == 'Q':
+            state = stack.pop() if stack else {}
+        elif op == '1 0 0 1 0 0 cm':
+            continue
+        elif op.startswith('BT ') and op.endswith(TEXT_NEXT_LINE):
+            op = op[:-len(TEXT_NEXT_LINE)] + ' ET'
+        else:
+            tokens = op.split()
+            operators = set(tokens) & (STATE_OPERATORS | UNTRACKED_OPERATORS)
+            if operators == {tokens[-1]} and tokens[-1] in STATE_OPERATORS and tokens[0] != 'BT':
+                if state.get(tokens[-1]) == op:
+                    continue
+                state[tokens[-1]] = op
+            elif operators:
+                # Text objects and lines with several operators (a colour
+                # set inside BT..ET outlives the ET): stop assuming anything.
+                state = {}
+        out.append(op)
+    if segments:
+        out.append(' '.join(segments) + ' S')
+    return out
+
+
+def binary_streams(doc):
+    # Gives every page and form of a ReportLab document a Flate-only content
+    # stream. ReportLab picks its filters from the global rl_config.useA85
+    # while saving; setting the streams up front leaves that setting (and
+    # every other render in the process) alone.
+    for obj in doc.idToObject.values():
+        if isinstance(obj, (PDFPage, PDFFormXObject)) and obj.Contents is None and obj.stream:
+            obj.Contents = PDFStream(content=obj.stream, filters=[PDFZCompress])
+            if isinstance(obj, PDFFormXObject):
+                # A compressed form would have its filters replaced again.
+                obj.compression = 0
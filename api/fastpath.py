@@ -0,0 +1,402 @@
+# Direct-canvas engine for the statement layout. It draws the same page as
+# PDFGenerator._build, but at fixed coordinates: no Paragraph parsing, no
+# Table width/height negotiation, no frame splitting. Geometry below mirrors
+# what platypus produces for the margins and table styles in api/index.py;
+# bench/compare_engines.py checks the two stay visually identical.
+from types import SimpleNamespace
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from api.model import format_cents
+from api.index import (
+    TRIP_COL_WIDTHS,
+    DEDUCTION_COL_WIDTHS,
+    SUMMARY_COL_WIDTHS,
+    FLEET_COL_WIDTHS,
+    FLEET_ROW_HEIGHT,
+    TRIP_LINE_HEIGHT,
+    TRIP_ROW_PADDING,
+    SUBTOTAL_ROW_HEIGHT,
+    trip_row_heights,
+)
+
+# SimpleDocTemplate frame: 30pt side margins, 150pt top, 50pt bottom, plus
+# the frame's own 6pt padding.
+FRAME_LEFT = 36
+FRAME_TOP = letter[1] - 150 - 6
+FRAME_BOTTOM = 50 + 6
+FRAME_WIDTH = sum(TRIP_COL_WIDTHS)
+
+CELL_PADDING = 6
+LEADING = TRIP_LINE_HEIGHT
+HEADER_HEIGHT = TRIP_LINE_HEIGHT + TRIP_ROW_PADDING
+SUBTOTAL_COL_WIDTHS = [FRAME_WIDTH - 250, 70, 110, 70]
+TOTAL_COL_WIDTHS = [FRAME_WIDTH - 70, 70]
+
+TRIP_ALIGNS = ('CENTER', 'CENTER', 'LEFT', 'LEFT', 'CENTER', 'CENTER', 'CENTER')
+
+PDF_ESCAPES = str.maketrans({'\\': '\\\\', '(': '\\(', ')': '\\)'})
+
+
+def _num(value):
+    return ('%.3f' % value).rstrip('0').rstrip('.')
+
+
+def column_edges(widths, x=FRAME_LEFT):
+    edges = [x]
+    for w in widths:
+        x += w
+        edges.append(x)
+    return edges
+
+
+class CanvasStatementRenderer:
+    def __init__(self, generator):
+        self.generator = generator
+        self.canvas = None
+        self.doc = None
+        self.y = FRAME_TOP
+
+    def render(self, content, layout='standard'):
+        self._begin(content['statement_info'], page_group=None, outline=None)
+        self._statement(content, layout)
+        self._finish()
+
+    def render_fleet(self, summary, contents, layouts):
+        # Same page sequence as PDFGenerator._build_fleet.
+        generator = self.generator
+        self._begin(summary['statement_info'], page_group='fleet', outline=generator._fleet_outline(None, None))
+        self._paragraph("Fleet Summary :", bold=True)
+        self._space(5)
+        self._fleet_table(summary['rows'])
+        for i, (content, layout) in enumerate(zip(contents, layouts)):
+            self.doc.statement_data = content['statement_info']
+            self.doc.page_group = i
+            self.doc.outline = generator._fleet_outline(i, content)
+            self._start_page()
+            self._statement(content, layout)
+        self._finish()
+
+    def _begin(self, statement_data, page_group, outline):
+        self.canvas = self.generator._make_canvas(self.generator.buffer, pagesize=letter)
+        self.doc = SimpleNamespace(statement_data=statement_data, page=0, page_group=page_group, outline=outline)
+        self._start_page()
+
+    def _finish(self):
+        self.canvas.showPage()
+        self.canvas.save()
+
+    def _statement(self, content, layout):
+        self.layout = layout
+        for line in content['recipient']:
+            self._paragraph(line, bold=True)
+        self._space(20)
+
+        self._paragraph("Trips :", bold=True)
+        self._space(5)
+        if layout == 'long':
+            self._long_trips(content)
+        else:
+            self._trips(content)
+        self._total_row(content['total_trips'], TOTAL_COL_WIDTHS)
+        self._space(10)
+
+        self._paragraph("Scheduled Deductions :", bold=True)
+        self._space(5)
+        self._deductions(content['deductions'])
+        self._total_row(content['total_deductions'], TOTAL_COL_WIDTHS)
+        self._space(20)
+
+        self._summary(content)
+        self._space(30)
+        self._paragraph(content['week_period'], bold=False)
+
+    # -- pages -------------------------------------------------------------
+
+    def _start_page(self):
+        if self.doc.page:
+            self.canvas.showPage()
+        self.doc.page += 1
+        self.generator._header_footer(self.canvas, self.doc)
+        self.y = FRAME_TOP
+
+    def _ensure(self, height):
+        if self.y - height < FRAME_BOTTOM:
+            self._start_page()
+
+    # -- primitives --------------------------------------------------------
+
+    def _space(self, height):
+        # Like a platypus Spacer: one that doesn't fit moves to the next
+        # page and still takes up its height there.
+        self._ensure(height)
+        self.y -= height
+
+    def _paragraph(self, text, bold):
+        # A one-line Normal paragraph: 10pt on 12pt leading.
+        self._ensure(LEADING)
+        c = self.canvas
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica-Bold" if bold else "Helvetica", 10)
+        c.drawString(FRAME_LEFT, self.y - 10, str(text))
+        self.y -= LEADING
+
+    def _cell(self, x0, x1, y, height, text, align, size, valign='BOTTOM'):
+        # Same placement rules as Table._drawCell for plain strings.
+        lines = str(text).split('\n')
+        if valign == 'MIDDLE':
+            ty = y + (height + len(lines) * LEADING) / 2.0 - size
+        else:
+            ty = y + TRIP_ROW_PADDING / 2 + len(lines) * LEADING - size
+        if align == 'LEFT':
+            x = x0 + CELL_PADDING
+        elif align == 'RIGHT':
+            x = x1 - CELL_PADDING
+        else:
+            x = (x0 + x1) / 2.0
+        for line in lines:
+            self._text(x, ty, line, align)
+            ty -= LEADING
+
+    def _text(self, x, y, line, align):
+        # Plain ASCII is written straight into the page stream in the current
+        # font; drawString would build a text object per cell. Anything else
+        # goes through reportlab so it gets encoded properly.
+        c = self.canvas
+        if not (line.isascii() and line.isprintable()):
+            if align == 'LEFT':
+                c.drawString(x, y, line)
+            elif align == 'RIGHT':
+                c.drawRightString(x, y, line)
+            else:
+                c.drawCentredString(x, y, line)
+            return
+        if align != 'LEFT':
+            width = stringWidth(line, c._fontname, c._fontsize)
+            x -= width if align == 'RIGHT' else width / 2.0
+        c._code.append('BT 1 0 0 1 %s %s Tm (%s) Tj ET' % (_num(x), _num(y), line.translate(PDF_ESCAPES)))
+
+    def _grid(self, edges, row_tops):
+        # Full grid over columns `edges` and rows delimited by `row_tops`
+        # (descending y values), as one path.
+        lines = [(edges[0], y, edges[-1], y) for y in row_tops]
+        lines += [(x, row_tops[-1], x, row_tops[0]) for x in edges]
+        self._stroke(lines)
+
+    def _box(self, x0, x1, y0, y1):
+        self._stroke([(x0, y1, x1, y1), (x0, y0, x1, y0), (x0, y0, x0, y1), (x1, y0, x1, y1)])
+
+    def _stroke(self, lines):
+        c = self.canvas
+        c.saveState()
+        c.setLineCap(1)
+        c.setLineJoin(1)
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(0.5)
+        c.lines(lines)
+        c.restoreState()
+
+    def _header_row(self, edges, labels, top, valign):
+        c = self.canvas
+        c.setFillColor(colors.lightgrey)
+        c.rect(edges[0], top - HEADER_HEIGHT, edges[-1] - edges[0], HEADER_HEIGHT, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica-Bold", 9)
+        for i, label in enumerate(labels):
+            self._cell(edges[i], edges[i + 1], top - HEADER_HEIGHT, HEADER_HEIGHT, label, 'CENTER', 9, valign)
+
+    # -- sections ----------------------------------------------------------
+
+    def _trips(self, content):
+        # Standard layout: one grid that Table would split at the page
+        # bottom, the header only on its first page.
+        rows = content['trips']
+        header, body = rows[0], rows[1:]
+        heights = trip_row_heights(rows)
+        edges = column_edges(TRIP_COL_WIDTHS)
+        c = self.canvas
+        self._ensure(HEADER_HEIGHT + (heights[0] if heights else 0))
+        top = self.y
+        self._header_row(edges, header, top, 'MIDDLE')
+        row_tops = [top, top - HEADER_HEIGHT]
+        y = top - HEADER_HEIGHT
+        c.setFont("Helvetica", 8)
+        for row, height in zip(body, heights):
+            if y - height < FRAME_BOTTOM:
+                self._grid(edges, row_tops)
+                self._start_page()
+                c.setFont("Helvetica", 8)
+                y = self.y
+                row_tops = [y]
+            y -= height
+            for i, align in enumerate(TRIP_ALIGNS):
+                self._cell(edges[i], edges[i + 1], y, height, row[i], align, 8, 'MIDDLE')
+            row_tops.append(y)
+        self._grid(edges, row_tops)
+        self.y = y
+
+    def _long_trips(self, content):
+        rows = content['trips']
+        header, body = rows[0], rows[1:]
+        amounts = content['trip_amounts']
+        heights = trip_row_heights(rows)
+        edges = column_edges(TRIP_COL_WIDTHS)
+        c = self.canvas
+        running = 0
+        start = 0
+        while True:
+            # Same chunking as the platypus long layout: fill the page and
+            # keep room for the subtotal row unless this is the last row.
+            available = self.y - FRAME_BOTTOM - 1
+            used = HEADER_HEIGHT
+            end = start
+            while end < len(body):
+                reserve = SUBTOTAL_ROW_HEIGHT if end + 1 < len(body) else 0
+                if used + heights[end] + reserve > available:
+                    break
+                used += heights[end]
+                end += 1
+            if end == start and body and start < len(body):
+                if self.y < FRAME_TOP:
+                    self._start_page()
+                    continue
+                end = start + 1
+
+            top = self.y
+            self._header_row(edges, header, top, 'MIDDLE')
+            row_tops = [top, top - HEADER_HEIGHT]
+            y = top - HEADER_HEIGHT
+            c.setFont("Helvetica", 8)
+            for index in range(start, end):
+                height = heights[index]
+                y -= height
+                row = body[index]
+                for i, align in enumerate(TRIP_ALIGNS):
+                    self._cell(edges[i], edges[i + 1], y, height, row[i], align, 8, 'MIDDLE')
+                row_tops.append(y)
+            self._grid(edges, row_tops)
+            self.y = y
+
+            if end >= len(body):
+                return
+            page_total = sum(amounts[start:end])
+            running += page_total
+            self._subtotal_row(page_total, running)
+            self._start_page()
+            start = end
+
+    def _subtotal_row(self, page_total, running):
+        fmt = format_cents
+        edges = column_edges(SUBTOTAL_COL_WIDTHS)
+        y = self.y - SUBTOTAL_ROW_HEIGHT
+        c = self.canvas
+        c.setFont("Helvetica-Bold", 8)
+        c.setFillColor(colors.black)
+        self._cell(edges[0], edges[1], y, SUBTOTAL_ROW_HEIGHT, "Page subtotal:", 'RIGHT', 8)
+        self._cell(edges[1], edges[2], y, SUBTOTAL_ROW_HEIGHT, fmt(page_total), 'CENTER', 8)
+        self._cell(edges[2], edges[3], y, SUBTOTAL_ROW_HEIGHT, "Running total:", 'RIGHT', 8)
+        self._cell(edges[3], edges[4], y, SUBTOTAL_ROW_HEIGHT, fmt(running), 'CENTER', 8)
+        self._box(edges[1], edges[2], y, self.y)
+        self._box(edges[3], edges[4], y, self.y)
+        self.y = y
+
+    def _total_row(self, amount, widths):
+        height = TRIP_LINE_HEIGHT + TRIP_ROW_PADDING
+        self._ensure(height)
+        edges = column_edges(widths)
+        y = self.y - height
+        c = self.canvas
+        c.setFont("Helvetica-Bold", 10)
+        c.setFillColor(colors.black)
+        self._cell(edges[0], edges[1], y, height, "Total:", 'RIGHT', 10)
+        c.setFillColor(colors.red)
+        self._cell(edges[1], edges[2], y, height, format_cents(amount), 'CENTER', 10)
+        c.setFillColor(colors.black)
+        self._box(edges[1], edges[2], y, self.y)
+        self.y = y
+
+    def _deductions(self, rows):
+        # Deductions follow Table's default split: rows carry on at the top
+        # of the next page without repeating the header.
+        header, body = rows[0], rows[1:]
+        edges = column_edges(DEDUCTION_COL_WIDTHS)
+        c = self.canvas
+        self._ensure(HEADER_HEIGHT)
+        top = self.y
+        self._header_row(edges, header, top, 'BOTTOM')
+        row_tops = [top, top - HEADER_HEIGHT]
+        y = top - HEADER_HEIGHT
+        c.setFont("Helvetica", 8)
+        for row in body:
+            height = LEADING * max(str(cell).count('\n') + 1 for cell in row) + TRIP_ROW_PADDING
+            if y - height < FRAME_BOTTOM:
+                self._grid(edges, row_tops)
+                self._start_page()
+                c.setFont("Helvetica", 8)
+                y = self.y
+                row_tops = [y]
+            y -= height
+            for i, cell in enumerate(row):
+                self._cell(edges[i], edges[i + 1], y, height, cell, 'CENTER', 8)
+            row_tops.append(y)
+        self._grid(edges, row_tops)
+        self.y = y
+
+    def _fleet_table(self, rows):
+        # Like Table with repeatRows=1: the header row is repeated on every
+        # page the summary runs onto. The last row (the totals) is bold.
+        header, body = rows[0], rows[1:]
+        edges = column_edges(FLEET_COL_WIDTHS)
+        c = self.canvas
+        self._ensure(HEADER_HEIGHT + FLEET_ROW_HEIGHT)
+        top = self.y
+        self._header_row(edges, header, top, 'MIDDLE')
+        row_tops = [top, top - HEADER_HEIGHT]
+        y = top - HEADER_HEIGHT
+        for index, row in enumerate(body):
+            if y - FLEET_ROW_HEIGHT < FRAME_BOTTOM:
+                self._grid(edges, row_tops)
+                self._start_page()
+                top = self.y
+                self._header_row(edges, header, top, 'MIDDLE')
+                row_tops = [top, top - HEADER_HEIGHT]
+                y = top - HEADER_HEIGHT
+            y -= FLEET_ROW_HEIGHT
+            c.setFont("Helvetica-Bold" if index == len(body) - 1 else "Helvetica", 8)
+            for i, cell in enumerate(row):
+                self._cell(edges[i], edges[i + 1], y, FLEET_ROW_HEIGHT, cell, 'CENTER', 8, 'MIDDLE')
+            row_tops.append(y)
+        self._grid(edges, row_tops)
+        self.y = y
+
+    def _summary(self, content):
+        # Two rows that Table splits between pages like any other table
+        # when only the first one fits.
+        fmt = format_cents
+        height = TRIP_LINE_HEIGHT + TRIP_ROW_PADDING
+        edges = column_edges(SUMMARY_COL_WIDTHS)
+        c = self.canvas
+        self._ensure(height)
+        c.setFont("Helvetica-Bold", 9)
+        y0 = self.y - height
+        c.setFillColor(colors.black)
+        self._cell(edges[0], edges[1], y0, height, "Total Net Year-To-Date : ", 'RIGHT', 9)
+        c.setFillColor(colors.blue)
+        self._cell(edges[1], edges[2], y0, height, fmt(content['ytd_net']), 'LEFT', 9)
+        self.y = y0
+
+        self._ensure(height)
+        c.setFont("Helvetica-Bold", 9)
+        y1 = self.y - height
+        c.setFillColor(colors.black)
+        self._cell(edges[0], edges[1], y1, height, "Total Gross Year-To-Date : ", 'RIGHT', 9)
+        self._cell(edges[2], edges[3], y1, height, "Check Amount:", 'RIGHT', 9)
+        c.setFillColor(colors.blue)
+        self._cell(edges[1], edges[2], y1, height, fmt(content['ytd_gross']), 'LEFT', 9)
+        c.setFillColor(colors.red)
+        self._cell(edges[3], edges[4], y1, height, fmt(content['check_amount']), 'CENTER', 9)
+        c.setFillColor(colors.black)
+        self._box(edges[3], edges[4], y1, self.y)
+        self.y = y1
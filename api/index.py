@@ -1,57 +1,188 @@
 from http.server import BaseHTTPRequestHandler
 import json
-import locale
-import io
 import os
+import traceback
+from urllib.parse import urlparse, parse_qs
+from collections import Counter
 from datetime import datetime
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+from reportlab.platypus.doctemplate import ActionFlowable
 from reportlab.pdfgen import canvas
 
-# Set locale for currency formatting
-try:
-    locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-except locale.Error:
-    try:
-        locale.setlocale(locale.LC_ALL, '')
-    except:
-        pass # Fallback if no locale supported
+from api.streams import RequestBody, ChunkedWriter, PDFBuffer, BodyTooLarge
+from api.resources import get_resources, LOGO_BOX
+from api.cache import get_cache, cache_key, etag_matches
+from api.model import InvalidStatement, StatementModel, check_statement, format_cents, to_cents
+from api.timing import PhaseTimer, log_event, profile_requested, dump_profile
+from api.ledger import Entry, get_ledger, statement_key
+from api.compact import OUTPUTS, compact_operators, binary_streams
+
+# Name of the per-document form XObject holding the static letterhead
+LETTERHEAD_FORM = 'Letterhead'
+
+LAYOUTS = ('auto', 'standard', 'long')
+# 'platypus' lays the statement out with SimpleDocTemplate; 'canvas' draws
+# the same fixed layout straight onto the canvas (api/fastpath.py).
+ENGINES = ('platypus', 'canvas')
+# 'auto' switches to the long-statement layout above this many trips.
+LONG_STATEMENT_THRESHOLD = 100
+# Hard ceiling for a single statement. The long layout renders 50k trips in
+# about 18s on one core (~0.35 ms per trip, growing linearly), comfortably
+# inside the 60s serverless timeout.
+MAX_TRIPS = 50000
+# Largest request body accepted, in bytes (and the longest NDJSON line). A
+# 50k-trip statement is about 12 MB of JSON.
+MAX_BODY_BYTES = int(os.environ.get('STATEMENT_MAX_BODY_BYTES', 16 * 1024 * 1024))
+
+# Returned by handler._parse_json after it has answered 400.
+INVALID_BODY = object()
+
+# Fixed geometry of the trips grid, matching what Table computes for the
+# 8/9pt fonts in TRIPS_TABLE_COMMANDS: 12pt leading plus 3pt top and bottom
+# padding per line.
+TRIP_COL_WIDTHS = [50, 60, 150, 120, 50, 50, 60]
+DEDUCTION_COL_WIDTHS = [sum(TRIP_COL_WIDTHS)-110, 50, 60]
+SUMMARY_COL_WIDTHS = [150, 100, sum(TRIP_COL_WIDTHS)-150-100-70, 70]
+TRIP_LINE_HEIGHT = 12
+TRIP_ROW_PADDING = 6
+SUBTOTAL_ROW_HEIGHT = 18
+# Fleet summary page of a consolidated statement: one single-line row per
+# statement plus a totals row.
+FLEET_COL_WIDTHS = [70, 80, 90, 50, 85, 80, 85]
+FLEET_HEADERS = ["Truck #", "Date", "Week", "Trips", "Trips Total", "Deductions", "Check Amount"]
+FLEET_ROW_HEIGHT = TRIP_LINE_HEIGHT + TRIP_ROW_PADDING
+
+
+def trip_row_heights(rows):
+    # Height of every body row (rows[0] is the header): one line per "\n"
+    # in the text columns, which is all Table would measure for plain strings.
+    return [
+        TRIP_LINE_HEIGHT * (max(str(cell).count('\n') for cell in row[:4]) + 1) + TRIP_ROW_PADDING
+        for row in rows[1:]
+    ]
+
+
+class StatementTooLarge(ValueError):
+    pass
+
+
+class StartStatement(ActionFlowable):
+    # Switches the page header to the next statement of a consolidated
+    # document. Placed just before that statement's PageBreak, so its first
+    # page already carries its truck number, date and outline entry.
+    def __init__(self, statement_data, page_group, outline):
+        ActionFlowable.__init__(self)
+        self.statement_data = statement_data
+        self.page_group = page_group
+        self.outline = outline
+
+    def apply(self, doc):
+        doc.statement_data = self.statement_data
+        doc.page_group = self.page_group
+        doc.outline = self.outline
+
+
+class StatementCanvas(canvas.Canvas):
+    # Keeps finished pages until save() so the footer can print "Page x Of N"
+    # with the real N in a single layout pass. Pages are numbered within
+    # their page_group (one group per statement). Outline entries are
+    # bookmarked as their page is written, when its page reference is known.
+    # A compact canvas also strips redundant operators from every page
+    # (api/compact.py).
+    def __init__(self, *args, timings=None, compact=False, **kwargs):
+        if compact:
+            kwargs['pageCompression'] = 1
+        canvas.Canvas.__init__(self, *args, **kwargs)
+        self.compact = compact
+        self.page_group = None
+        self.page_count = 0
+        self.outline = []
+        self.timings = timings or PhaseTimer()
+        self._deferred_pages = []
+
+    def showPage(self):
+        self._deferred_pages.append((self.page_group, dict(self.__dict__)))
+        self.outline = []
+        self._startPage()
+
+    def save(self):
+        # Page numbers plus serializing the whole document to the buffer.
+        with self.timings.phase('save'):
+            page_count = len(self._deferred_pages)
+            totals = Counter(group for group, _ in self._deferred_pages)
+            numbers = Counter()
+            outlined = False
+            for group, state in self._deferred_pages:
+                self.__dict__.update(state)
+                numbers[group] += 1
+                for key, title in self.outline:
+                    self.bookmarkPage(key)
+                    self.addOutlineEntry(title, key, level=0)
+                    outlined = True
+                self.saveState()
+                self.setFont("Helvetica", 8)
+                self.drawRightString(self._pagesize[0] - 30, 20, f"Page {numbers[group]} Of {totals[group]}")
+                self.restoreState()
+                if self.compact:
+                    self._code[:] = compact_operators(self._code)
+                canvas.Canvas.showPage(self)
+            self.page_count = page_count
+            if outlined:
+                self.showOutline()
+            if self.compact:
+                binary_streams(self._doc)
+            canvas.Canvas.save(self)
 
 class PDFGenerator:
-    def __init__(self, buffer):
+    def __init__(self, buffer, layout='auto', engine='platypus', timings=None, ledger=None, output='standard'):
+        if layout not in LAYOUTS:
+            raise ValueError(f"unknown layout {layout!r}")
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}")
+        if output not in OUTPUTS:
+            raise ValueError(f"unknown output {output!r}")
         self.buffer = buffer
-        self.styles = getSampleStyleSheet()
+        self.layout = layout
+        self.engine = engine
+        self.output = output
+        # Logo, styles and table styles are built once per process.
+        self.resources = get_resources()
+        self.styles = self.resources.styles
         self.width, self.height = letter
+        # Per-phase wall time of this render (see api/timing.py); the page
+        # count is known once the canvas has been saved.
+        self.timings = timings or PhaseTimer()
+        self.canvas = None
+        self.pages = None
+        self.layout_used = None
+        # The per-truck ledger (api/ledger.py) to record this statement in and
+        # take missing YTD figures from. Only the paths that issue statements
+        # (the handler, batches and job workers) pass get_ledger(); any other
+        # render, e.g. a benchmark, leaves the ledger alone.
+        self.ledger = ledger
 
     def format_currency(self, amount):
+        # Dollars in, "$1,234.56" / "($37.50)" out, independent of locale.
+        # Statement totals are already cents and use format_cents directly.
         try:
-            if amount < 0:
-                return f"({locale.currency(abs(amount), grouping=True)})"
-            return locale.currency(amount, grouping=True)
-        except:
-             return f"${amount:,.2f}"
+            return format_cents(to_cents(amount))
+        except ValueError:
+            return format_cents(0)
 
-    def _header_footer(self, canvas, doc):
-        canvas.saveState()
-        
+    def _letterhead(self, canvas):
+        # Everything on the page frame that is the same on every page. Drawn
+        # once per document into a form XObject and referenced from each page.
         # Logo (Top Left)
-        # Try to find logo.png in the same directory as the script
-        logo_path = os.path.join(os.path.dirname(__file__), 'logo.png')
+        # Decoded and encoded once per process by the resource registry;
+        # compact statements get a copy resampled to their print size
+        logo = self.resources.compact_logo() if self.output == 'compact' else self.resources.logo
         
-        if os.path.exists(logo_path):
-            try:
-                # Draw logo - adjusting width/height to fit approx 2 inches wide
-                # preserveAspectRatio=True is important
-                canvas.drawImage(logo_path, 30, self.height - 110, width=2.5*inch, height=1*inch, preserveAspectRatio=True, mask='auto')
-            except Exception as e:
-                # Fallback if image fails to load
-                canvas.setFont("Helvetica-Bold", 14)
-                canvas.drawString(40, self.height - 60, "SPF Transportation LLC")
+        if logo is not None:
+            # Draw logo - fit into approx 2.5 x 1 inch, aspect ratio preserved
+            logo.draw(canvas, 30, self.height - 110, width=LOGO_BOX[0], height=LOGO_BOX[1])
         else:
-            # Fallback if file not found
+            # Fallback if file not found or unreadable
             canvas.setFont("Helvetica-Bold", 14)
             canvas.drawString(40, self.height - 60, "SPF Transportation LLC")
         
@@ -60,102 +191,327 @@ class PDFGenerator:
         canvas.drawString(30, self.height - 120, "8046 S Carnaby CT Hanover Park, IL 60133")
         canvas.drawString(30, self.height - 130, "Phone #: (312)690-3717")
 
+        canvas.setFont("Helvetica-Bold", 12)
+        canvas.drawRightString(self.width - 30, self.height - 50, "Statement")
+        canvas.setFont("Helvetica", 12)
+        canvas.drawRightString(self.width - 30, self.height - 65, "FITRIGHT LOGISTICS LLC")
+
+        # Footer
+        canvas.setFont("Helvetica", 8)
+        canvas.drawString(30, 30, "SPF Transportation LLC")
+        canvas.drawCentredString(self.width / 2, 30, "ProTransport Trucking Software")
+        canvas.drawCentredString(self.width / 2, 20, "www.pro-transport.com")
+
+    def _make_canvas(self, *args, **kwargs):
+        # canvasmaker for both engines: keeps hold of the canvas for its
+        # page count and lets it report the time spent saving.
+        self.canvas = StatementCanvas(*args, timings=self.timings, compact=self.output == 'compact', **kwargs)
+        return self.canvas
+
+    def _header_footer(self, canvas, doc):
+        with self.timings.phase('header'):
+            self._draw_header_footer(canvas, doc)
+
+    def _draw_header_footer(self, canvas, doc):
+        canvas.saveState()
+
+        if not canvas.hasForm(LETTERHEAD_FORM):
+            canvas.beginForm(LETTERHEAD_FORM)
+            self._letterhead(canvas)
+            canvas.endForm()
+        canvas.doForm(LETTERHEAD_FORM)
+
         # Statement Info
         statement_data = getattr(doc, 'statement_data', {})
         date_str = statement_data.get('date', datetime.now().strftime("%m/%d/%Y"))
         truck_num = statement_data.get('truck_number', "196")
+        # The fleet summary page of a consolidated statement has no truck
+        truck_label = statement_data.get('truck_label', f"Truck # {truck_num}")
 
-        canvas.setFont("Helvetica-Bold", 12)
-        canvas.drawRightString(self.width - 30, self.height - 50, "Statement")
         canvas.setFont("Helvetica", 12)
-        canvas.drawRightString(self.width - 30, self.height - 65, "FITRIGHT LOGISTICS LLC")
         canvas.drawRightString(self.width - 30, self.height - 80, f"Date: {date_str}")
-        canvas.drawRightString(self.width - 30, self.height - 95, f"Truck # {truck_num}")
+        canvas.drawRightString(self.width - 30, self.height - 95, truck_label)
 
         # Footer
         canvas.setFont("Helvetica", 8)
-        canvas.drawString(30, 30, "SPF Transportation LLC")
         canvas.drawString(30, 20, datetime.now().strftime("%m/%d/%y %H:%M"))
-        
-        canvas.drawCentredString(self.width / 2, 30, "ProTransport Trucking Software")
-        canvas.drawCentredString(self.width / 2, 20, "www.pro-transport.com")
-        
-        canvas.drawRightString(self.width - 30, 20, f"Page {doc.page} Of 1")
+        # "Page x Of N" is added by StatementCanvas once N is known
+        canvas.page_group = getattr(doc, 'page_group', None)
+        outline = getattr(doc, 'outline', None)
+        if outline is not None:
+            canvas.outline.append(outline)
+            doc.outline = None
 
         canvas.restoreState()
 
+    def _long_trip_tables(self, rows, amounts, first_page_height, frame_height):
+        # Long-statement layout: cut the trips into tables that each fill
+        # exactly one page, using fixed row heights instead of letting Table
+        # measure and split one huge grid. Every chunk repeats the header row
+        # and all but the last end with a page subtotal and running total.
+        header = rows[0]
+        header_height = TRIP_LINE_HEIGHT + TRIP_ROW_PADDING
+        heights = trip_row_heights(rows)
+        elements = []
+        running = 0
+        start = 0
+        # Leave a point of slack so rounding never pushes a chunk over.
+        available = frame_height - first_page_height - 1
+        while start < len(heights):
+            # Fill the page, keeping room for the subtotal row unless the
+            # row being added is the very last one.
+            used = header_height
+            end = start
+            while end < len(heights):
+                reserve = SUBTOTAL_ROW_HEIGHT if end + 1 < len(heights) else 0
+                if used + heights[end] + reserve > available:
+                    break
+                used += heights[end]
+                end += 1
+            if end == start:
+                # A row taller than a whole page; let Table split it.
+                end = start + 1
+            chunk = Table([header] + rows[1 + start:1 + end], colWidths=TRIP_COL_WIDTHS,
+                          rowHeights=[header_height] + heights[start:end])
+            chunk.setStyle(self.resources.trips_table_style)
+            elements.append(chunk)
+            if end < len(heights):
+                page_total = sum(amounts[start:end])
+                running += page_total
+                t_subtotal = Table([["Page subtotal:", format_cents(page_total),
+                                     "Running total:", format_cents(running)]],
+                                   colWidths=[sum(TRIP_COL_WIDTHS) - 250, 70, 110, 70],
+                                   rowHeights=[SUBTOTAL_ROW_HEIGHT])
+                t_subtotal.setStyle(self.resources.subtotal_table_style)
+                elements.append(t_subtotal)
+                elements.append(PageBreak())
+            start = end
+            available = frame_height - 1
+        return elements
+
+    def _prepare(self, data):
+        # Everything both engines need, computed once: formatted table rows,
+        # per-trip amounts and the totals (all money in integer cents).
+        content = {'statement_info': data.get('statement_info', {})}
+
+        # Recipient Info
+        recipient = data.get('recipient', {})
+        content['recipient'] = [
+            recipient.get('name', 'FITRIGHT LOGISTICS LLC'),
+            recipient.get('address_line_1', '3374 FLAMBOROUGH DR'),
+            recipient.get('address_line_2', 'Orlando, FL 32835'),
+        ]
+
+        # Trips and Deductions, parsed into exact integer-cent columns
+        model = StatementModel(data)
+        content['model'] = model
+        trip_headers = ["Date", "Trip #", "Route", "Description", "Quantity", "Rate", "Amount"]
+        content['trips'] = [trip_headers] + model.trip_rows()
+        content['trip_amounts'] = model.trip_amounts
+        content['total_trips'] = model.total_trips
+
+        deduction_headers = ["Description", "Date", "Amount"]
+        content['deductions'] = [deduction_headers] + model.deduction_rows()
+        content['total_deductions'] = model.total_deductions
+
+        # Summary Section
+        # YTD values are passed from the frontend, or come from the ledger
+        # when the payload has none; "Check Amount" is trips plus
+        # deductions, which arrive signed (negative).
+        content['ytd_net'] = model.ytd_net
+        content['ytd_gross'] = model.ytd_gross
+        content['check_amount'] = model.check_amount
+        content['ledger_entry'] = None
+        content['ytd_source'] = 'payload'
+        if self.ledger is not None:
+            entry = content['ledger_entry'] = Entry.from_statement(content['statement_info'], model)
+            if entry is not None and 'ytd' not in data:
+                content['ytd_gross'], content['ytd_net'] = self.ledger.ytd(entry)
+                content['ytd_source'] = 'ledger'
+
+        # Week Period (displayed at bottom)
+        week_period = data.get('statement_info', {}).get('week_period', '')
+        if not week_period:
+             week_period = f"{datetime.now().strftime('%m.%d')}-{datetime.now().strftime('%m.%d')}"
+        content['week_period'] = str(week_period)
+        return content
+
+    def _layout_for(self, trips):
+        if self.layout != 'auto':
+            return self.layout
+        return 'long' if trips > LONG_STATEMENT_THRESHOLD else 'standard'
+
+    def _record(self, contents):
+        entries = [content['ledger_entry'] for content in contents if content['ledger_entry'] is not None]
+        if entries:
+            with self.timings.phase('ledger'):
+                for entry in entries:
+                    self.ledger.record(entry)
+
+    def prepare(self, data):
+        # Everything generate() computes before drawing, as (content, layout):
+        # the rows, amounts and totals the PDF will show. The preview
+        # endpoint (api/preview.py) is built on this, so its numbers are the
+        # PDF's numbers.
+        check_statement(data)
+        trips = data.get('trips', [])
+        if len(trips) > MAX_TRIPS:
+            raise StatementTooLarge(f"{len(trips)} trips exceeds the limit of {MAX_TRIPS} per statement")
+        with self.timings.phase('prepare'):
+            content = self._prepare(data)
+        return content, self._layout_for(len(trips))
+
     def generate(self, data):
-        doc = SimpleDocTemplate(self.buffer, pagesize=letter,
-                                rightMargin=30, leftMargin=30,
-                                topMargin=150, bottomMargin=50)
+        content, layout = self.prepare(data)
+        if self.engine == 'canvas':
+            from api.fastpath import CanvasStatementRenderer
+            with self.timings.phase('draw'):
+                CanvasStatementRenderer(self).render(content, layout)
+        else:
+            self._build(content, layout)
+        self.layout_used = layout
+        self.pages = self.canvas.page_count
+        self._record([content])
+
+    def generate_fleet(self, statements):
+        # Consolidated mode: every statement in one document, each starting on
+        # a new page with its own header, page numbers and outline entry,
+        # after a fleet summary page. The letterhead form, logo and fonts are
+        # written once for the whole document, so size and time grow with
+        # the trips, not the number of trucks. MAX_TRIPS applies to the
+        # document as a whole.
+        if not statements:
+            raise ValueError("a consolidated statement needs at least one statement")
+        for i, data in enumerate(statements):
+            try:
+                check_statement(data)
+            except InvalidStatement as e:
+                raise InvalidStatement(f"statement {i}: {e}") from None
+        total = sum(len(data.get('trips', [])) for data in statements)
+        if total > MAX_TRIPS:
+            raise StatementTooLarge(f"{total} trips exceeds the limit of {MAX_TRIPS} per document")
+
+        with self.timings.phase('prepare'):
+            contents = [self._prepare(data) for data in statements]
+            summary = self._fleet_summary(contents)
+        layouts = [self._layout_for(len(content['model'])) for content in contents]
+        if self.engine == 'canvas':
+            from api.fastpath import CanvasStatementRenderer
+            with self.timings.phase('draw'):
+                CanvasStatementRenderer(self).render_fleet(summary, contents, layouts)
+        else:
+            self._build_fleet(summary, contents, layouts)
+        self.layout_used = layouts
+        self.pages = self.canvas.page_count
+        self._record(contents)
+
+    def _fleet_summary(self, contents):
+        # Header values and table rows of the fleet summary page, totals in
+        # the last row.
+        dates = {content['statement_info'].get('date') for content in contents}
+        info = {'truck_label': f"Fleet: {len(contents)} statements"}
+        if len(dates) == 1 and None not in dates:
+            info['date'] = dates.pop()
+        rows = [FLEET_HEADERS]
+        for content in contents:
+            statement_info = content['statement_info']
+            rows.append([
+                str(statement_info.get('truck_number', "196")).replace('\n', ' '),
+                str(statement_info.get('date', '')).replace('\n', ' '),
+                str(content['week_period']).replace('\n', ' '),
+                str(len(content['model'])),
+                format_cents(content['total_trips']),
+                format_cents(content['total_deductions']),
+                format_cents(content['check_amount']),
+            ])
+        rows.append([
+            "Total", "", "",
+            str(sum(len(content['model']) for content in contents)),
+            format_cents(sum(content['total_trips'] for content in contents)),
+            format_cents(sum(content['total_deductions'] for content in contents)),
+            format_cents(sum(content['check_amount'] for content in contents)),
+        ])
+        return {'statement_info': info, 'rows': rows}
+
+    def _fleet_outline(self, index, content):
+        # (bookmark key, outline title) of a statement in a consolidated
+        # document; None is the summary page.
+        if index is None:
+            return 'fleet-summary', "Fleet summary"
+        info = content['statement_info']
+        title = f"Truck {info.get('truck_number', '196')}"
+        if info.get('date'):
+            title += f" - {info['date']}"
+        return f"statement-{index}", title
+
+    def _doc_template(self):
+        return SimpleDocTemplate(self.buffer, pagesize=letter,
+                                 rightMargin=30, leftMargin=30,
+                                 topMargin=150, bottomMargin=50)
+
+    def _build_fleet(self, summary, contents, layouts):
+        doc = self._doc_template()
+        doc.statement_data = summary['statement_info']
+        doc.page_group = 'fleet'
+        doc.outline = self._fleet_outline(None, None)
+
+        with self.timings.phase('flowables'):
+            elements = self._fleet_flowables(summary)
+            for i, (content, layout) in enumerate(zip(contents, layouts)):
+                elements.append(StartStatement(content['statement_info'], i, self._fleet_outline(i, content)))
+                elements.append(PageBreak())
+                elements.extend(self._flowables(doc, content, layout))
+        with self.timings.phase('layout'):
+            doc.build(elements, onFirstPage=self._header_footer, onLaterPages=self._header_footer,
+                      canvasmaker=self._make_canvas)
+
+    def _fleet_flowables(self, summary):
+        rows = summary['rows']
+        table = Table(rows, colWidths=FLEET_COL_WIDTHS, rowHeights=[FLEET_ROW_HEIGHT] * len(rows), repeatRows=1)
+        table.setStyle(self.resources.fleet_table_style)
+        return [Paragraph("<b>Fleet Summary :</b>", self.resources.bold_style), Spacer(1, 5), table]
+
+    def _build(self, content, layout):
+        doc = self._doc_template()
         
-        doc.statement_data = data.get('statement_info', {})
+        doc.statement_data = content['statement_info']
 
+        with self.timings.phase('flowables'):
+            elements = self._flowables(doc, content, layout)
+        # Platypus wrapping, splitting and drawing; the page header and the
+        # final save are timed separately as 'header' and 'save'.
+        with self.timings.phase('layout'):
+            doc.build(elements, onFirstPage=self._header_footer, onLaterPages=self._header_footer,
+                      canvasmaker=self._make_canvas)
+
+    def _flowables(self, doc, content, layout):
         elements = []
-        normal_style = self.styles["Normal"]
-        bold_style = ParagraphStyle('Bold', parent=normal_style, fontName='Helvetica-Bold', fontSize=10)
+        normal_style = self.resources.normal_style
+        bold_style = self.resources.bold_style
         
         # Recipient Info
-        recipient = data.get('recipient', {})
-        elements.append(Paragraph(f"<b>{recipient.get('name', 'FITRIGHT LOGISTICS LLC')}</b>", normal_style))
-        elements.append(Paragraph(f"<b>{recipient.get('address_line_1', '3374 FLAMBOROUGH DR')}</b>", normal_style))
-        elements.append(Paragraph(f"<b>{recipient.get('address_line_2', 'Orlando, FL 32835')}</b>", normal_style))
+        for line in content['recipient']:
+            elements.append(Paragraph(f"<b>{line}</b>", normal_style))
         elements.append(Spacer(1, 20))
 
         # Trips Section
         elements.append(Paragraph("<b>Trips :</b>", bold_style))
         elements.append(Spacer(1, 5))
-        
-        trip_headers = ["Date", "Trip #", "Route", "Description", "Quantity", "Rate", "Amount"]
-        processed_trips = [trip_headers]
-        total_trips_amount = 0.0
-        
-        for trip in data.get('trips', []):
-            try:
-                qty = float(trip.get('quantity', 0))
-                rate = float(trip.get('rate', 0))
-                # Auto-calculate amount
-                amount = qty * rate
-            except:
-                amount = 0.0
-                qty = 0.0
-                rate = 0.0
-                
-            total_trips_amount += amount
-            processed_trips.append([
-                trip.get('date', ''),
-                trip.get('trip_number', ''),
-                trip.get('route', ''),
-                trip.get('description', ''),
-                f"{qty:.2f}",
-                f"{rate:.4f}",
-                self.format_currency(amount)
-            ])
 
-        col_widths = [50, 60, 150, 120, 50, 50, 60]
-        t_trips = Table(processed_trips, colWidths=col_widths)
-        t_trips.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (3, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        elements.append(t_trips)
+        col_widths = TRIP_COL_WIDTHS
+        if layout == 'long':
+            frame_width = doc.width - 12
+            frame_height = doc.height - 12
+            first_page_height = sum(e.wrap(frame_width, frame_height)[1] for e in elements)
+            elements.extend(self._long_trip_tables(content['trips'], content['trip_amounts'], first_page_height, frame_height))
+        else:
+            t_trips = Table(content['trips'], colWidths=col_widths)
+            t_trips.setStyle(self.resources.trips_table_style)
+            elements.append(t_trips)
         
         # Trips Total
-        t_trip_total = Table([["Total:", self.format_currency(total_trips_amount)]], colWidths=[sum(col_widths)-70, 70])
-        t_trip_total.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
-            ('GRID', (1, 0), (1, 0), 0.5, colors.black),
-        ]))
+        t_trip_total = Table([["Total:", format_cents(content['total_trips'])]], colWidths=[sum(col_widths)-70, 70])
+        t_trip_total.setStyle(self.resources.total_table_style)
         elements.append(t_trip_total)
         elements.append(Spacer(1, 10))
 
@@ -163,114 +519,434 @@ class PDFGenerator:
         elements.append(Paragraph("<b>Scheduled Deductions :</b>", bold_style))
         elements.append(Spacer(1, 5))
         
-        deduction_headers = ["Description", "Date", "Amount"]
-        processed_deductions = [deduction_headers]
-        total_deductions_amount = 0.0
-        
-        for ded in data.get('deductions', []):
-            try:
-                amount = float(ded.get('amount', 0))
-            except:
-                amount = 0.0
-            total_deductions_amount += amount
-            processed_deductions.append([
-                ded.get('description', ''),
-                ded.get('date', ''),
-                self.format_currency(amount)
-            ])
-        
-        ded_col_widths = [sum(col_widths)-110, 50, 60]
-        t_deductions = Table(processed_deductions, colWidths=ded_col_widths)
-        t_deductions.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
+        ded_col_widths = DEDUCTION_COL_WIDTHS
+        t_deductions = Table(content['deductions'], colWidths=ded_col_widths)
+        t_deductions.setStyle(self.resources.deductions_table_style)
         elements.append(t_deductions)
         
         # Deductions Total
-        t_ded_total = Table([["Total:", self.format_currency(total_deductions_amount)]], colWidths=[sum(ded_col_widths)-70, 70])
-        t_ded_total.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
-            ('GRID', (1, 0), (1, 0), 0.5, colors.black),
-        ]))
+        t_ded_total = Table([["Total:", format_cents(content['total_deductions'])]], colWidths=[sum(ded_col_widths)-70, 70])
+        t_ded_total.setStyle(self.resources.total_table_style)
         elements.append(t_ded_total)
         elements.append(Spacer(1, 20))
 
         # Summary Section
-        # YTD values passed from frontend or calculated?
-        # Assuming passed or just placeholders. The user said they will provide amounts.
-        # We will calculate "Check Amount" dynamically.
-        ytd_net = data.get('ytd', {}).get('net', 0.0)
-        ytd_gross = data.get('ytd', {}).get('gross', 0.0)
-        check_amount = total_trips_amount + total_deductions_amount # Deductions are negative usually? 
-        # Note: In the image/logic, deductions amount was ($37.50) which implies negative.
-        # If user sends positive number for deduction, we might need to subtract.
-        # However, usually in accounting data, if it's a deduction, it might be stored as negative.
-        # Let's assume the frontend sends the signed value or we sum them up. 
-        # In the previous script I summed them. If the input is negative, it subtracts.
-        
         t_summary = Table([
-            [f"Total Net Year-To-Date : ", self.format_currency(ytd_net), "", ""],
-            [f"Total Gross Year-To-Date : ", self.format_currency(ytd_gross), "Check Amount:", self.format_currency(check_amount)]
-        ], colWidths=[150, 100, sum(col_widths)-150-100-70, 70])
-        
-        t_summary.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TEXTCOLOR', (1, 0), (1, 1), colors.blue),
-            ('TEXTCOLOR', (3, 1), (3, 1), colors.red),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
-            ('ALIGN', (3, 1), (3, 1), 'CENTER'),
-            ('GRID', (3, 1), (3, 1), 0.5, colors.black),
-        ]))
+            [f"Total Net Year-To-Date : ", format_cents(content['ytd_net']), "", ""],
+            [f"Total Gross Year-To-Date : ", format_cents(content['ytd_gross']), "Check Amount:", format_cents(content['check_amount'])]
+        ], colWidths=SUMMARY_COL_WIDTHS)
+        t_summary.setStyle(self.resources.summary_table_style)
         elements.append(t_summary)
         
         elements.append(Spacer(1, 30))
-        
-        # Week Period (displayed at bottom)
-        week_period = data.get('statement_info', {}).get('week_period', '')
-        if not week_period:
-             week_period = f"{datetime.now().strftime('%m.%d')}-{datetime.now().strftime('%m.%d')}"
-             
-        elements.append(Paragraph(week_period, normal_style))
+        elements.append(Paragraph(content['week_period'], normal_style))
+        return elements
 
-        doc.build(elements, onFirstPage=self._header_footer, onLaterPages=self._header_footer)
+# Build the logo and style registry while the module is imported, so the
+# first request doesn't pay for decoding the logo. It holds only immutable
+# bytes and styles (no clock, file handle, thread or process), which keeps
+# the module safe to snapshot and restore. Worker pools and the PDF cache
+# stay lazy for the same reason.
+get_resources()
 
 class handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the streaming mode can use chunked transfer encoding; every
+    # other response sends a Content-Length.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, the body of
+    # every response on a kept-alive connection waits ~40 ms for the client's
+    # delayed ACK.
+    disable_nagle_algorithm = True
+
+    def _render_options(self):
+        # Per-request rendering choices come from the query string, e.g.
+        # /api/index.py?layout=long&engine=canvas&output=compact. Returns
+        # None after sending a 400.
+        query = parse_qs(urlparse(self.path).query)
+        options = {}
+        layout = query.get('layout', ['auto'])[0]
+        if layout not in LAYOUTS:
+            # The body is left unread, so this connection can't be reused.
+            self.close_connection = True
+            self._send_json(400, {'error': f"unknown layout {layout!r}, expected one of {', '.join(LAYOUTS)}"})
+            return None
+        options['layout'] = layout
+        engine = query.get('engine', ['platypus'])[0]
+        if engine not in ENGINES:
+            self.close_connection = True
+            self._send_json(400, {'error': f"unknown engine {engine!r}, expected one of {', '.join(ENGINES)}"})
+            return None
+        options['engine'] = engine
+        output = query.get('output', ['standard'])[0]
+        if output not in OUTPUTS:
+            self.close_connection = True
+            self._send_json(400, {'error': f"unknown output {output!r}, expected one of {', '.join(OUTPUTS)}"})
+            return None
+        options['output'] = output
+        return options
+
+    def _job_route(self):
+        # '/api/jobs/<id>/pdf' -> ('/api/jobs', ['<id>', 'pdf']); None when
+        # the URL isn't part of the job API.
+        parts = urlparse(self.path).path.rstrip('/').split('/')
+        if 'jobs' not in parts:
+            return None
+        i = parts.index('jobs')
+        return '/'.join(parts[:i + 1]), parts[i + 1:]
+
     def do_POST(self):
-        content_len = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_len)
+        options = self._render_options()
+        if options is None:
+            return
+
+        # Long statements can be queued instead of rendered inline: POST
+        # .../jobs answers 202 with a job id right away (api/jobs.py).
+        route = self._job_route()
+        if route is not None:
+            return self._submit_job(options, *route)
+
+        # Totals and an HTML rendering for the form, without a PDF
+        # (api/preview.py).
+        if urlparse(self.path).path.rstrip('/').endswith('/preview'):
+            return self._preview(options)
+
+        # Newline-delimited JSON is streamed: one statement per line in, one
+        # ZIP entry per statement out as soon as it is rendered.
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type in ('application/x-ndjson', 'application/jsonl'):
+            return self._stream_batch(options)
+
+        # Per-phase timings go out in Server-Timing and a JSON log line;
+        # the whole request can also be profiled on demand (api/timing.py).
+        timings = PhaseTimer()
+        record = {'event': 'statement', 'path': urlparse(self.path).path}
+        self.response_status = None
+        profiler = None
+        if profile_requested(self.headers):
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
         try:
-            data = json.loads(body)
-        except:
-            data = {}
+            self._post_statement(options, timings, record, profiling=profiler is not None)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                record['profile'] = dump_profile(profiler)
+            record['status'] = self.response_status
+            record['phases'] = timings.as_ms()
+            record['total_ms'] = round(timings.elapsed() * 1000, 2)
+            log_event(record)
 
-        buffer = io.BytesIO()
-        gen = PDFGenerator(buffer)
-        gen.generate(data)
-        
-        pdf_value = buffer.getvalue()
-        buffer.close()
+    def _post_statement(self, options, timings, record, profiling=False):
+        with timings.phase('read'):
+            body = self._read_body()
+        if body is None:
+            return
+        with timings.phase('parse'):
+            data = self._parse_json(body)
+        if data is INVALID_BODY:
+            return
+
+        # A JSON array with ?fleet=1 is one consolidated PDF for the whole
+        # fleet; otherwise it is a batch: one statement payload per truck,
+        # rendered in parallel and returned as a single ZIP.
+        if isinstance(data, list) and self._fleet_requested():
+            return self._send_fleet(data, options, timings, record)
+        if isinstance(data, list):
+            # Imported here: the process pool machinery is only needed for
+            # batches and would otherwise add to every cold start.
+            from api.batch import render_batch
+            with timings.phase('render'):
+                archive, manifest = render_batch(data, options)
+            record.update(event='batch', statements=len(data),
+                          rendered=manifest['rendered'], failed=manifest['failed'], bytes=len(archive))
+            self.send_response(200)
+            self.send_header('Content-type', 'application/zip')
+            self.send_header('Content-Disposition', 'attachment; filename="statements.zip"')
+            self.send_header('Content-Length', str(len(archive)))
+            self.send_header('X-Statements-Rendered', str(manifest['rendered']))
+            self.send_header('X-Statements-Failed', str(manifest['failed']))
+            self.send_header('Server-Timing', timings.server_timing())
+            self.end_headers()
+            with timings.phase('write'):
+                self.wfile.write(archive)
+            return
+
+        try:
+            check_statement(data)
+        except InvalidStatement as e:
+            record['error'] = str(e)
+            return self._send_json(400, {'error': str(e)})
+        record.update(engine=options['engine'], layout=options['layout'],
+                      trips=len(data.get('trips', [])))
+
+        # Identical payloads render identical statements: answer from the
+        # cache, or with 304 when the client already has this one.
+        with timings.phase('cache'):
+            cache = get_cache()
+            key = cache_key(data, self._ledger_options(data, options))
+            etag = f'"{key}"'
+            not_modified = etag_matches(self.headers.get('If-None-Match'), etag)
+            # A profiled request always renders; that's what is being profiled.
+            pdf_value = None if not_modified or profiling else cache.get(key)
+        if not_modified:
+            cache.record_not_modified()
+            record['cache'] = 'NOT_MODIFIED'
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'private, no-cache')
+            self.send_header('Server-Timing', timings.server_timing())
+            self.end_headers()
+            return
+
+        cache_status = 'HIT'
+        if pdf_value is None:
+            cache_status = 'MISS'
+            buffer = PDFBuffer()
+            gen = PDFGenerator(buffer, timings=timings, ledger=get_ledger(), **options)
+            try:
+                gen.generate(data)
+            except StatementTooLarge as e:
+                record['error'] = str(e)
+                return self._send_json(413, {'error': str(e)})
+            except Exception as e:
+                return self._render_failed(e, record)
+            
+            # The bytes ReportLab produced, not a copy; the cache keeps
+            # that same object.
+            pdf_value = buffer.getvalue()
+            buffer.close()
+            with timings.phase('cache'):
+                cache.put(key, pdf_value)
+            record.update(layout=gen.layout_used, pages=gen.pages)
+        record.update(cache=cache_status, bytes=len(pdf_value))
         
         self.send_response(200)
         self.send_header('Content-type', 'application/pdf')
         self.send_header('Content-Disposition', 'attachment; filename="statement.pdf"')
+        self.send_header('Content-Length', str(len(pdf_value)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'private, no-cache')
+        self.send_header('X-Cache', cache_status)
+        self.send_header('Server-Timing', timings.server_timing())
+        self.end_headers()
+        with timings.phase('write'):
+            self.wfile.write(pdf_value)
+
+    def _fleet_requested(self):
+        fleet = parse_qs(urlparse(self.path).query).get('fleet', [''])[0]
+        return fleet.lower() in ('1', 'true', 'yes')
+
+    def _send_fleet(self, statements, options, timings, record):
+        record.update(event='fleet', statements=len(statements), engine=options['engine'])
+        buffer = PDFBuffer()
+        gen = PDFGenerator(buffer, timings=timings, ledger=get_ledger(), **options)
+        try:
+            gen.generate_fleet(statements)
+        except StatementTooLarge as e:
+            record['error'] = str(e)
+            return self._send_json(413, {'error': str(e)})
+        except ValueError as e:
+            record['error'] = str(e)
+            return self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            return self._render_failed(e, record)
+        pdf = buffer.getvalue()
+        buffer.close()
+        record.update(pages=gen.pages, bytes=len(pdf))
+        self.send_response(200)
+        self.send_header('Content-type', 'application/pdf')
+        self.send_header('Content-Disposition', 'attachment; filename="fleet_statement.pdf"')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.send_header('Server-Timing', timings.server_timing())
         self.end_headers()
-        self.wfile.write(pdf_value)
+        with timings.phase('write'):
+            self.wfile.write(pdf)
+
+    def _ledger_options(self, data, options):
+        # A statement whose YTD comes from the ledger renders differently once
+        # earlier statements of that truck are recorded, so the running
+        # totals before it are part of its cache key. A cache hit is a
+        # statement already recorded with the same totals and isn't recorded
+        # again.
+        ledger = get_ledger()
+        if ledger is None or not isinstance(data, dict) or 'ytd' in data:
+            return options
+        key = statement_key(data.get('statement_info', {}))
+        if key is None:
+            return options
+        return dict(options, ledger=ledger.prior(*key))
+
+    def send_response(self, code, message=None):
+        # Remembered for the request's log record.
+        self.response_status = code
+        BaseHTTPRequestHandler.send_response(self, code, message)
+
+    def handle_expect_100(self):
+        # Refuse an oversized upload before the client sends it.
+        length = self.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': f"request body exceeds the limit of {MAX_BODY_BYTES} bytes"})
+            return False
+        return BaseHTTPRequestHandler.handle_expect_100(self)
+
+    def _read_body(self):
+        # The request body, read incrementally up to MAX_BODY_BYTES. Returns
+        # None after answering 413 (too large) or 400 (malformed framing);
+        # the rest of the body is unread, so the connection is closed.
+        try:
+            return RequestBody(self.rfile, self.headers, limit=MAX_BODY_BYTES).read()
+        except BodyTooLarge as e:
+            status = 413
+            error = str(e)
+        except ValueError as e:
+            status = 400
+            error = str(e)
+        self.close_connection = True
+        self._send_json(status, {'error': error})
+        return None
+
+    def _parse_json(self, body):
+        # json.loads takes the bytearray as is (UTF-8/16/32 are detected).
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            self._send_json(400, {'error': f"request body is not valid JSON: {e}"})
+            return INVALID_BODY
+
+    def _stream_batch(self, options):
+        from api.batch import stream_batch
+        try:
+            body = RequestBody(self.rfile, self.headers, limit=MAX_BODY_BYTES)
+        except ValueError as e:
+            self.close_connection = True
+            return self._send_json(400, {'error': str(e)})
+        # HTTP/1.0 clients can't take chunked bodies; send close-delimited.
+        chunked = self.request_version != 'HTTP/1.0'
+        self.send_response(200)
+        self.send_header('Content-type', 'application/zip')
+        self.send_header('Content-Disposition', 'attachment; filename="statements.zip"')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+
+        out = ChunkedWriter(self.wfile, chunked=chunked)
+        stream_batch(body.iter_lines(), out, options)
+        out.close()
+        if not body.complete:
+            # The batch ended on a body error; whatever is left of the body
+            # can't be parsed as the next request.
+            self.close_connection = True
+
+    def _submit_job(self, options, base, rest):
+        if rest:
+            self.close_connection = True
+            return self._send_json(404, {'error': "submit jobs with POST to .../jobs"})
+        body = self._read_body()
+        if body is None:
+            return
+        data = self._parse_json(body)
+        if data is INVALID_BODY:
+            return
+        try:
+            check_statement(data)
+        except InvalidStatement as e:
+            return self._send_json(400, {'error': f"a job is one statement payload: {e}"})
+        trips = data.get('trips', [])
+        if len(trips) > MAX_TRIPS:
+            return self._send_json(413, {'error': f"{len(trips)} trips exceeds the limit of {MAX_TRIPS} per statement"})
+
+        from api.jobs import get_queue, ensure_workers
+        job_id = get_queue().submit(data, options)
+        ensure_workers()
+        status_url = f"{base}/{job_id}"
+        self._send_json(202, {'id': job_id, 'status': 'queued', 'status_url': status_url,
+                              'pdf_url': f"{status_url}/pdf"},
+                        headers={'Location': status_url})
+
+    def _preview(self, options):
+        timings = PhaseTimer()
+        with timings.phase('read'):
+            body = self._read_body()
+        if body is None:
+            return
+        with timings.phase('parse'):
+            data = self._parse_json(body)
+        if data is INVALID_BODY:
+            return
+        from api.preview import preview_statement
+        try:
+            preview = preview_statement(data, options)
+        except InvalidStatement as e:
+            return self._send_json(400, {'error': str(e)})
+        except StatementTooLarge as e:
+            return self._send_json(413, {'error': str(e)})
+        self._send_json(200, preview, headers={'Cache-Control': 'no-store',
+                                               'Server-Timing': timings.server_timing()})
+
+    def _get_job(self, base, rest):
+        from api.jobs import get_queue, jobs_config
+        if not rest:
+            return self._send_json(200, jobs_config())
+        if len(rest) == 1:
+            job = get_queue().status(rest[0])
+            if job is None:
+                return self._send_json(404, {'error': "unknown job"})
+            job.update(status_url=f"{base}/{job['id']}", pdf_url=f"{base}/{job['id']}/pdf")
+            return self._send_json(200, job)
+        if len(rest) != 2 or rest[1] != 'pdf':
+            return self._send_json(404, {'error': "not found"})
+
+        job, pdf = get_queue().artifact(rest[0])
+        if job is None:
+            return self._send_json(404, {'error': "unknown job"})
+        if job['status'] == 'expired':
+            return self._send_json(410, job)
+        if job['status'] != 'done' or pdf is None:
+            # Still queued or running (poll the status URL), or failed.
+            return self._send_json(409, job, headers={'Retry-After': '1'} if job['status'] != 'failed' else None)
+        self.send_response(200)
+        self.send_header('Content-type', 'application/pdf')
+        self.send_header('Content-Disposition', f'attachment; filename="statement_{job["id"]}.pdf"')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.send_header('Cache-Control', 'private, no-cache')
+        self.end_headers()
+        self.wfile.write(pdf)
 
     def do_GET(self):
+        route = self._job_route()
+        if route is not None:
+            return self._get_job(*route)
+
+        if self.path.split('?')[0].rstrip('/').endswith('/cache'):
+            return self._send_json(200, get_cache().stats())
+
+        message = "Send a POST request with JSON data to generate PDF.".encode('utf-8')
         self.send_response(200)
         self.send_header('Content-type', 'text/plain')
+        self.send_header('Content-Length', str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
+    def _render_failed(self, error, record):
+        # A bug, not a bad request: the client still gets an answer instead
+        # of a dropped connection, and the traceback goes in the log line.
+        record['error'] = f"{type(error).__name__}: {error}"
+        record['traceback'] = traceback.format_exc()
+        return self._send_json(500, {'error': "the statement could not be rendered"})
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write("Send a POST request with JSON data to generate PDF.".encode('utf-8'))
+        self.wfile.write(body)
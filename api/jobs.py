@@ -0,0 +1,329 @@
+# Asynchronous render jobs backed by a local SQLite queue.
+#
+# POST /api/jobs stores the payload and returns a job id straight away;
+# worker processes claim queued jobs, render them and keep the PDF in the
+# database until it expires. Everything lives in one SQLite file, so it
+# needs no external service:
+#
+#     STATEMENT_JOBS_DB         queue file (default: statement-jobs.sqlite3 in
+#                               the temp directory)
+#     STATEMENT_JOB_WORKERS     worker processes started by the server on the
+#                               first submitted job (default 2; 0 = none, run
+#                               `python -m api.jobs` instead)
+#     STATEMENT_JOB_ATTEMPTS    attempts per job before it fails (default 3)
+#     STATEMENT_JOB_TTL         seconds a finished job and its PDF are kept
+#                               (default 86400)
+#     STATEMENT_JOBS_ENABLED    set to 1 where workers run; GET /api/jobs
+#                               reports it so the web form only queues jobs
+#                               then (api/server.py sets it itself)
+#     STATEMENT_JOB_TRIPS       statements with more trips than this are
+#                               queued by the form (default 10000)
+#
+# Workers need a long-running process (the local server or
+# `python -m api.jobs`); a serverless instance may be frozen as soon as its
+# response is sent, and the next poll may reach another instance with its
+# own /tmp. That is why the form renders inline unless jobs are enabled.
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), 'statement-jobs.sqlite3')
+DEFAULT_WORKERS = 2
+DEFAULT_ATTEMPTS = 3
+DEFAULT_TTL = 24 * 60 * 60
+# About 4 s of rendering; MAX_TRIPS statements still fit a synchronous request.
+DEFAULT_JOB_TRIPS = 10000
+
+# A running job whose worker hasn't finished it within the lease (crashed,
+# killed, machine restarted) is handed to another worker.
+LEASE_SECONDS = 10 * 60
+# Failed attempts are retried after 2s, 4s, 8s, ...
+RETRY_DELAY = 2.0
+POLL_INTERVAL = 0.5
+EXPIRE_INTERVAL = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT,
+    options TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    error TEXT,
+    pages INTEGER,
+    bytes INTEGER,
+    pdf BLOB,
+    created REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    finished REAL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+"""
+
+STATUS_COLUMNS = 'id, status, attempts, max_attempts, error, pages, bytes, created, finished, expires'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+class JobQueue:
+    # Every call opens its own short-lived connection, so one JobQueue can be
+    # shared by the handler threads and used from any worker process.
+    def __init__(self, path=None, max_attempts=None, ttl=None):
+        self.path = path or os.environ.get('STATEMENT_JOBS_DB') or DEFAULT_DB
+        self.max_attempts = max_attempts or _env_int('STATEMENT_JOB_ATTEMPTS', DEFAULT_ATTEMPTS)
+        self.ttl = ttl if ttl is not None else _env_int('STATEMENT_JOB_TTL', DEFAULT_TTL)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        # Autocommit; claim() takes the write lock explicitly.
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Closing(db)
+
+    def submit(self, payload, options=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, payload, options, max_attempts, created, available_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), json.dumps(options or {}), self.max_attempts, now, now))
+        return job_id
+
+    def status(self, job_id):
+        with self._connect() as db:
+            row = db.execute(f"SELECT {STATUS_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def artifact(self, job_id):
+        # (status row, PDF bytes or None), or (None, None) for an unknown id.
+        with self._connect() as db:
+            row = db.execute(f"SELECT {STATUS_COLUMNS}, pdf FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None, None
+        job = dict(row)
+        return job, job.pop('pdf')
+
+    def counts(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def claim(self):
+        # Atomically takes the oldest ready job: queued and past its retry
+        # delay, or running with an expired lease. Returns (id, payload,
+        # options) or None.
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    row = db.execute(
+                        "SELECT id, status, payload, options, attempts, max_attempts FROM jobs "
+                        "WHERE (status = 'queued' AND available_at <= ?) "
+                        "   OR (status = 'running' AND lease_until < ?) "
+                        "ORDER BY created LIMIT 1", (now, now)).fetchone()
+                    if row is None:
+                        db.execute('COMMIT')
+                        return None
+                    if row['status'] == 'running' and row['attempts'] >= row['max_attempts']:
+                        # Its last worker died mid-render; don't try again.
+                        self._finish(db, row['id'], 'failed', now, error="worker lost")
+                        continue
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? "
+                        "WHERE id = ?", (now + LEASE_SECONDS, row['id']))
+                    db.execute('COMMIT')
+                    return row['id'], json.loads(row['payload']), json.loads(row['options'])
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def complete(self, job_id, pdf, pages=None):
+        with self._connect() as db:
+            self._finish(db, job_id, 'done', time.time(), pdf=pdf, pages=pages)
+
+    def fail(self, job_id, error, permanent=False):
+        # Requeues with backoff until the job is out of attempts.
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            if permanent or row['attempts'] >= row['max_attempts']:
+                self._finish(db, job_id, 'failed', now, error=error)
+            else:
+                delay = RETRY_DELAY * 2 ** (row['attempts'] - 1)
+                db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, lease_until = NULL, available_at = ? "
+                    "WHERE id = ?", (error, now + delay, job_id))
+
+    def _finish(self, db, job_id, status, now, error=None, pdf=None, pages=None):
+        # The payload isn't needed any more; the PDF is kept until expiry.
+        db.execute(
+            "UPDATE jobs SET status = ?, error = ?, pdf = ?, pages = ?, bytes = ?, payload = NULL, "
+            "lease_until = NULL, finished = ?, expires = ? WHERE id = ?",
+            (status, error, pdf, pages, len(pdf) if pdf is not None else None, now, now + self.ttl, job_id))
+
+    def expire(self, now=None):
+        # Drops the PDFs of finished jobs past their expiry (their status stays
+        # visible as 'expired' for another TTL) and forgets older ones.
+        now = now or time.time()
+        with self._connect() as db:
+            expired = db.execute(
+                "UPDATE jobs SET status = 'expired', pdf = NULL WHERE status IN ('done', 'failed') "
+                "AND expires <= ?", (now,)).rowcount
+            db.execute("DELETE FROM jobs WHERE status = 'expired' AND expires <= ?", (now - self.ttl,))
+        return expired
+
+
+class _Closing:
+    # sqlite3's own context manager only commits; this one also closes.
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+def render_job(payload, options):
+    # (pdf bytes, page count). ValueError means the payload itself is bad
+    # (e.g. StatementTooLarge), which no retry will fix.
+    from api.index import PDFGenerator
+    from api.ledger import get_ledger
+    from api.streams import PDFBuffer
+    buffer = PDFBuffer()
+    generator = PDFGenerator(buffer, ledger=get_ledger(), **options)
+    generator.generate(payload)
+    return buffer.getvalue(), generator.pages
+
+
+def run_worker(path=None, stop=None):
+    queue = JobQueue(path)
+    if stop is None:
+        # Running as its own process: SIGTERM lets the current job finish,
+        # and Ctrl-C is left to whoever started the workers.
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    next_expiry = 0.0
+    while not stop.is_set():
+        if time.monotonic() >= next_expiry:
+            queue.expire()
+            next_expiry = time.monotonic() + EXPIRE_INTERVAL
+        job = queue.claim()
+        if job is None:
+            stop.wait(POLL_INTERVAL)
+            continue
+        job_id, payload, options = job
+        try:
+            pdf, pages = render_job(payload, options)
+        except ValueError as e:
+            queue.fail(job_id, f"{type(e).__name__}: {e}", permanent=True)
+        except Exception as e:
+            queue.fail(job_id, f"{type(e).__name__}: {e}")
+        else:
+            queue.complete(job_id, pdf, pages)
+
+
+# The queue and worker processes used by the handler in this process, both
+# created on first use so plain statement requests never touch SQLite.
+_queue = None
+_workers = []
+_lock = threading.Lock()
+
+
+def jobs_config():
+    # What GET /api/jobs reports: whether this deployment runs job workers,
+    # and from how many trips a statement should be queued.
+    return {'enabled': os.environ.get('STATEMENT_JOBS_ENABLED', '') not in ('', '0'),
+            'min_trips': _env_int('STATEMENT_JOB_TRIPS', DEFAULT_JOB_TRIPS)}
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def ensure_workers():
+    # Starts (or restarts dead) worker processes for the local queue.
+    count = _env_int('STATEMENT_JOB_WORKERS', DEFAULT_WORKERS)
+    # Outside _lock: get_queue() takes it too.
+    path = get_queue().path
+    with _lock:
+        _workers[:] = [p for p in _workers if p.is_alive()]
+        while len(_workers) < count:
+            process = multiprocessing.Process(target=run_worker, args=(path,),
+                                              name='statement-job-worker', daemon=True)
+            process.start()
+            _workers.append(process)
+    return len(_workers)
+
+
+def stop_workers(timeout=None):
+    # Asks the workers to finish their current job and waits for them.
+    with _lock:
+        workers = list(_workers)
+        _workers.clear()
+    for process in workers:
+        process.terminate()
+    for process in workers:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run statement job workers against the local queue.")
+    parser.add_argument('--db', help="queue file (default: $STATEMENT_JOBS_DB or the temp directory)")
+    parser.add_argument('--workers', type=int, default=_env_int('STATEMENT_JOB_WORKERS', DEFAULT_WORKERS))
+    parser.add_argument('--expire', action='store_true', help="expire old artifacts once and exit")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.expire:
+        print(f"expired {queue.expire()} jobs")
+        return 0
+    processes = [multiprocessing.Process(target=run_worker, args=(queue.path,)) for _ in range(max(1, args.workers))]
+    for process in processes:
+        process.start()
+    print(f"{len(processes)} workers on {queue.path}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,390 @@
+# Per-truck ledger of generated statements, for server-side year-to-date
+# figures.
+#
+# Set STATEMENT_LEDGER_DB to a SQLite file to turn it on. Every statement the
+# API issues (the handler, batches and job workers) is then recorded under
+# (truck number, statement date) with its gross (trips total) and net (check
+# amount); other renders, such as the benchmarks or the offline CLI, neither
+# read nor write it unless they pass PDFGenerator a ledger. A payload sent
+# without a "ytd" object gets its Year-To-Date lines from the ledger: the
+# running totals of that truck's earlier statements in the same calendar
+# year plus this one. A payload that does send "ytd" is printed as sent;
+# `check` reports where those figures disagree with the ledger.
+#
+# Each row carries the running totals through its own date and a per-year
+# table holds the year totals, so filling in YTD is one index lookup on
+# (truck, date). Recording a statement out of order, or re-rendering one
+# with different totals, shifts the running totals of that truck's later
+# statements in the same year.
+#
+#     python -m api.ledger rebuild statements/      # replace the ledger
+#     python -m api.ledger backfill old/*.json      # add to it
+#     python -m api.ledger check [statements/]      # verify, exit 1 on problems
+#     python -m api.ledger show 196 [2025]
+#
+# Statements of one truck rendered concurrently (two weeks in the same batch)
+# each see the ledger as it stood when they started; render them in date
+# order when the earlier one has to count towards the later one.
+import json
+import os
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    truck TEXT NOT NULL,
+    date TEXT NOT NULL,
+    gross INTEGER NOT NULL,
+    net INTEGER NOT NULL,
+    ytd_gross INTEGER NOT NULL,
+    ytd_net INTEGER NOT NULL,
+    trips INTEGER NOT NULL,
+    recorded REAL NOT NULL,
+    PRIMARY KEY (truck, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS years (
+    truck TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    gross INTEGER NOT NULL,
+    net INTEGER NOT NULL,
+    statements INTEGER NOT NULL,
+    PRIMARY KEY (truck, year)
+) WITHOUT ROWID;
+"""
+
+
+def statement_key(info, now=None):
+    # (truck number, ISO date) the statement is filed under, or None for a
+    # statement that can't be placed: no truck number or an unreadable date.
+    if not isinstance(info, dict):
+        return None
+    truck = str(info.get('truck_number') or '').strip()
+    date = statement_date(info.get('date'), now)
+    if not truck or date is None:
+        return None
+    return truck, date
+
+
+def statement_date(value, now=None):
+    # ISO date of a statement_info date ("12/12/2025", "12/12/25" or
+    # "2025-12-12"); a missing date is today, as on the rendered statement.
+    # None when it can't be read.
+    if value is None:
+        return (now or datetime.now()).date().isoformat()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+class Entry:
+    # One statement's line in the ledger; amounts in integer cents.
+    __slots__ = ('truck', 'date', 'gross', 'net', 'trips')
+
+    def __init__(self, truck, date, gross, net, trips):
+        self.truck = truck
+        self.date = date
+        self.gross = gross
+        self.net = net
+        self.trips = trips
+
+    @classmethod
+    def from_statement(cls, info, model, now=None):
+        key = statement_key(info, now)
+        if key is None:
+            return None
+        return cls(*key, model.total_trips, model.check_amount, len(model))
+
+    @property
+    def year(self):
+        return int(self.date[:4])
+
+
+class Ledger:
+    # Like the job queue, every call opens its own short-lived connection, so
+    # one Ledger is safe to share between threads and processes.
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        # Autocommit; writers take the lock with BEGIN IMMEDIATE. sqlite3 is
+        # imported here so the function module doesn't load it when the
+        # ledger is off.
+        import sqlite3
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def prior(self, truck, date, db=None):
+        # (gross, net) running totals of the truck's statements earlier in
+        # the same year than `date`.
+        if db is None:
+            with self._connect() as db:
+                return self.prior(truck, date, db)
+        row = db.execute(
+            "SELECT ytd_gross, ytd_net FROM statements WHERE truck = ? AND date >= ? AND date < ? "
+            "ORDER BY date DESC LIMIT 1", (truck, date[:4] + '-01-01', date)).fetchone()
+        return tuple(row) if row is not None else (0, 0)
+
+    def ytd(self, entry):
+        # (gross, net) year to date through this statement.
+        gross, net = self.prior(entry.truck, entry.date)
+        return gross + entry.gross, net + entry.net
+
+    def record(self, entry):
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                self._record(db, entry, time.time())
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def _record(self, db, entry, now):
+        old = db.execute("SELECT gross, net FROM statements WHERE truck = ? AND date = ?",
+                         (entry.truck, entry.date)).fetchone()
+        old_gross, old_net = old if old is not None else (0, 0)
+        gross, net = self.prior(entry.truck, entry.date, db)
+        db.execute(
+            "INSERT OR REPLACE INTO statements (truck, date, gross, net, ytd_gross, ytd_net, trips, recorded) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry.truck, entry.date, entry.gross, entry.net,
+             gross + entry.gross, net + entry.net, entry.trips, now))
+        delta_gross, delta_net = entry.gross - old_gross, entry.net - old_net
+        if delta_gross or delta_net:
+            db.execute(
+                "UPDATE statements SET ytd_gross = ytd_gross + ?, ytd_net = ytd_net + ? "
+                "WHERE truck = ? AND date > ? AND date <= ?",
+                (delta_gross, delta_net, entry.truck, entry.date, f"{entry.year}-12-31"))
+        db.execute(
+            "INSERT INTO years (truck, year, gross, net, statements) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT (truck, year) DO UPDATE SET gross = gross + excluded.gross, "
+            "net = net + excluded.net, statements = statements + ?",
+            (entry.truck, entry.year, delta_gross, delta_net, 0 if old is not None else 1))
+
+    def rebuild(self, entries):
+        # Replaces the whole ledger with `entries` in one transaction; a later
+        # entry for the same truck and date replaces an earlier one.
+        latest = {}
+        for entry in entries:
+            latest[entry.truck, entry.date] = entry
+        now = time.time()
+        rows = []
+        years = {}
+        running = {}
+        for (truck, date), entry in sorted(latest.items()):
+            key = (truck, entry.year)
+            gross, net = running.get(key, (0, 0))
+            gross, net = running[key] = (gross + entry.gross, net + entry.net)
+            rows.append((truck, date, entry.gross, entry.net, gross, net, entry.trips, now))
+            count = years.get(key, (0, 0, 0))[2]
+            years[key] = (gross, net, count + 1)
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute("DELETE FROM statements")
+                db.execute("DELETE FROM years")
+                db.executemany("INSERT INTO statements VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                db.executemany("INSERT INTO years VALUES (?, ?, ?, ?, ?)",
+                               [(truck, year) + totals for (truck, year), totals in years.items()])
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def backfill(self, entries):
+        # Records `entries` next to what is already there, in one transaction.
+        count = 0
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                for entry in entries:
+                    self._record(db, entry, now)
+                    count += 1
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return count
+
+    def statements(self, truck, year=None):
+        low, high = (f"{year}-01-01", f"{year}-12-31") if year else ('', '~')
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT date, gross, net, ytd_gross, ytd_net, trips FROM statements "
+                "WHERE truck = ? AND date >= ? AND date <= ? ORDER BY date", (truck, low, high)).fetchall()
+        return [dict(zip(('date', 'gross', 'net', 'ytd_gross', 'ytd_net', 'trips'), row)) for row in rows]
+
+    def lookup(self, truck, date):
+        with self._connect() as db:
+            row = db.execute("SELECT gross, net, ytd_gross, ytd_net FROM statements WHERE truck = ? AND date = ?",
+                             (truck, date)).fetchone()
+        return dict(zip(('gross', 'net', 'ytd_gross', 'ytd_net'), row)) if row is not None else None
+
+    def verify(self):
+        # Problems in the ledger itself: running totals that aren't the sum
+        # of the statements before them, or year totals that don't add up.
+        problems = []
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT truck, date, gross, net, ytd_gross, ytd_net FROM statements ORDER BY truck, date")
+            sums = {}
+            for truck, date, gross, net, ytd_gross, ytd_net in rows:
+                key = (truck, int(date[:4]))
+                total_gross, total_net, count = sums.get(key, (0, 0, 0))
+                sums[key] = total_gross, total_net, count = (total_gross + gross, total_net + net, count + 1)
+                if (ytd_gross, ytd_net) != (total_gross, total_net):
+                    problems.append(f"truck {truck} {date}: running totals {ytd_gross}/{ytd_net} cents, "
+                                    f"statements add up to {total_gross}/{total_net}")
+            years = {(truck, year): (gross, net, count)
+                     for truck, year, gross, net, count in db.execute("SELECT * FROM years")}
+        for key in sorted(set(sums) | set(years)):
+            if sums.get(key) != years.get(key):
+                problems.append(f"truck {key[0]} {key[1]}: year totals {years.get(key)}, "
+                                f"statements add up to {sums.get(key)}")
+        return problems
+
+
+_ledgers = {}
+_lock = threading.Lock()
+
+
+def get_ledger():
+    # The ledger configured by STATEMENT_LEDGER_DB, or None when it is off.
+    path = os.environ.get('STATEMENT_LEDGER_DB')
+    if not path:
+        return None
+    with _lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            ledger = _ledgers[path] = Ledger(path)
+    return ledger
+
+
+def read_statements(paths):
+    # Yields (source, payload) for statement payloads in JSON files (one
+    # object, or an array as sent to the batch endpoint) and NDJSON files;
+    # directories are searched for both.
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(
+                os.path.join(directory, name)
+                for directory, _, files in os.walk(path) for name in files
+                if name.endswith(('.json', '.ndjson', '.jsonl')))
+            yield from read_statements(names)
+            continue
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.ndjson', '.jsonl')):
+                for number, line in enumerate(f, 1):
+                    if line.strip():
+                        yield f"{path}:{number}", json.loads(line)
+                continue
+            data = json.load(f)
+        if isinstance(data, list):
+            for i, payload in enumerate(data):
+                yield f"{path}[{i}]", payload
+        else:
+            yield path, data
+
+
+def entries_from(paths, skipped=None):
+    # Ledger entries for the statements in `paths`, totalled exactly as the
+    # generator totals them. Statements that can't be placed are appended to
+    # `skipped` as (source, reason).
+    from api.model import StatementModel
+    for source, payload in read_statements(paths):
+        entry = None
+        if isinstance(payload, dict):
+            entry = Entry.from_statement(payload.get('statement_info', {}), StatementModel(payload))
+        if entry is not None:
+            yield source, payload, entry
+        elif skipped is not None:
+            skipped.append((source, "no truck number or unreadable date"))
+
+
+def check(ledger, paths):
+    # Ledger problems plus, for every statement in `paths`, whether the
+    # ledger has it with the same totals and whether any YTD figures it
+    # carries match the ledger's.
+    from api.model import to_cents
+    problems = ledger.verify()
+    for source, payload, entry in entries_from(paths):
+        row = ledger.lookup(entry.truck, entry.date)
+        if row is None:
+            problems.append(f"{source}: truck {entry.truck} {entry.date} is not in the ledger")
+            continue
+        if (row['gross'], row['net']) != (entry.gross, entry.net):
+            problems.append(f"{source}: totals {entry.gross}/{entry.net} cents, "
+                            f"ledger has {row['gross']}/{row['net']}")
+        ytd = payload.get('ytd')
+        if isinstance(ytd, dict):
+            try:
+                sent = f"{to_cents(ytd.get('gross', 0))}/{to_cents(ytd.get('net', 0))}"
+            except ValueError:
+                sent = "unreadable"
+            if sent != f"{row['ytd_gross']}/{row['ytd_net']}":
+                problems.append(f"{source}: YTD sent as {sent}, ledger has "
+                                f"{row['ytd_gross']}/{row['ytd_net']} cents")
+    return problems
+
+
+def main(argv=None):
+    import argparse
+    from api.model import format_cents
+    parser = argparse.ArgumentParser(description="Maintain the per-truck statement ledger.")
+    parser.add_argument('--db', default=os.environ.get('STATEMENT_LEDGER_DB'),
+                        help="ledger file (default: $STATEMENT_LEDGER_DB)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, text in (('rebuild', "replace the ledger with these statements"),
+                       ('backfill', "add these statements to the ledger")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('paths', nargs='+', help="statement JSON/NDJSON files or directories")
+    command = commands.add_parser('check', help="verify the ledger, and against these statements if given")
+    command.add_argument('paths', nargs='*')
+    command = commands.add_parser('show', help="list a truck's statements")
+    command.add_argument('truck')
+    command.add_argument('year', nargs='?', type=int)
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("no ledger file: pass --db or set STATEMENT_LEDGER_DB")
+    ledger = Ledger(args.db)
+
+    if args.command in ('rebuild', 'backfill'):
+        skipped = []
+        entries = (entry for _, _, entry in entries_from(args.paths, skipped))
+        count = ledger.rebuild(entries) if args.command == 'rebuild' else ledger.backfill(entries)
+        for source, reason in skipped:
+            print(f"skipped {source}: {reason}")
+        print(f"{args.command}: {count} statements recorded in {ledger.path}")
+        return 0
+
+    if args.command == 'check':
+        problems = check(ledger, args.paths)
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} problems" if problems else "ledger is consistent")
+        return 1 if problems else 0
+
+    rows = ledger.statements(args.truck, args.year)
+    print(f"{'date':<12} {'gross':>14} {'net':>14} {'ytd gross':>14} {'ytd net':>14} {'trips':>6}")
+    for row in rows:
+        print(f"{row['date']:<12} {format_cents(row['gross']):>14} {format_cents(row['net']):>14} "
+              f"{format_cents(row['ytd_gross']):>14} {format_cents(row['ytd_net']):>14} {row['trips']:>6}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
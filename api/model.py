@@ -0,0 +1,147 @@
+# Columnar, exact-money view of a statement payload. Money is held as integer
+# cents, quantities and rates as fixed-point integers, each column in its own
+# array, so totals are exact and nothing depends on the process locale.
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+
+# Quantities and rates are kept to 1/10000 (rates are displayed with all
+# four places, quantities rounded to two).
+QUANTITY_SCALE = 10000
+RATE_SCALE = 10000
+# qty * rate comes out in units of 1 / (QUANTITY_SCALE * RATE_SCALE) dollars.
+AMOUNT_DIVISOR = QUANTITY_SCALE * RATE_SCALE // 100
+# Inputs above this magnitude are treated like unparseable ones, which keeps
+# every per-trip amount inside a signed 64-bit array slot.
+MAX_MAGNITUDE = 10 ** 8
+
+
+class InvalidStatement(ValueError):
+    # A payload that isn't shaped like a statement; the API answers 400.
+    pass
+
+
+def check_statement(data):
+    # Raises InvalidStatement unless `data` has the shape of a statement
+    # payload: an object whose sections, when present, are objects and lists
+    # of objects. Values inside them are parsed (or zeroed) by the model.
+    if not isinstance(data, dict):
+        raise InvalidStatement("a statement payload must be a JSON object")
+    for name in ('statement_info', 'recipient', 'ytd'):
+        if name in data and not isinstance(data[name], dict):
+            raise InvalidStatement(f"'{name}' must be an object")
+    for name in ('trips', 'deductions'):
+        items = data.get(name, [])
+        if not isinstance(items, list):
+            raise InvalidStatement(f"'{name}' must be a list")
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise InvalidStatement(f"'{name}[{i}]' must be an object")
+
+
+def _round_div(numerator, divisor):
+    # Integer division rounding half away from zero, the way money rounds.
+    quotient, remainder = divmod(abs(numerator), divisor)
+    if remainder * 2 >= divisor:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def to_fixed(value, scale):
+    # Exact fixed-point integer for a JSON number or numeric string. Raises
+    # ValueError for anything that isn't a finite number in range.
+    if isinstance(value, int):
+        number = Decimal(value)
+    else:
+        try:
+            number = Decimal(repr(value) if isinstance(value, float) else str(value).strip())
+        except (ArithmeticError, TypeError):
+            raise ValueError(f"not a number: {value!r}")
+    if not number.is_finite() or abs(number) > MAX_MAGNITUDE:
+        raise ValueError(f"not a number in range: {value!r}")
+    return int((number * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def to_cents(value):
+    return to_fixed(value, 100)
+
+
+def format_fixed(value, scale, places):
+    # Fixed-point integer to a plain decimal string, e.g. (20000000, 10000, 2)
+    # -> "2000.00". No grouping, like f"{x:.2f}".
+    value = _round_div(value * 10 ** places, scale)
+    sign = '-' if value < 0 else ''
+    whole, frac = divmod(abs(value), 10 ** places)
+    return f"{sign}{whole}.{frac:0{places}d}" if places else f"{sign}{whole}"
+
+
+def format_cents(cents):
+    # "$1,234.56", negatives in parentheses: "($37.50)".
+    whole, frac = divmod(abs(cents), 100)
+    if cents < 0:
+        return f"(${whole:,}.{frac:02d})"
+    return f"${whole:,}.{frac:02d}"
+
+
+class StatementModel:
+    def __init__(self, data):
+        trips = data.get('trips', [])
+        self.trip_dates = [trip.get('date', '') for trip in trips]
+        self.trip_numbers = [trip.get('trip_number', '') for trip in trips]
+        self.trip_routes = [trip.get('route', '') for trip in trips]
+        self.trip_descriptions = [trip.get('description', '') for trip in trips]
+
+        self.quantities = array('q')
+        self.rates = array('q')
+        for trip in trips:
+            try:
+                quantity = to_fixed(trip.get('quantity', 0), QUANTITY_SCALE)
+                rate = to_fixed(trip.get('rate', 0), RATE_SCALE)
+            except ValueError:
+                # Same as before: a bad quantity or rate zeroes the whole row.
+                quantity = rate = 0
+            self.quantities.append(quantity)
+            self.rates.append(rate)
+        # Amounts are always quantity * rate; any 'amount' sent is ignored.
+        self.trip_amounts = array('q', [
+            _round_div(q * r, AMOUNT_DIVISOR) for q, r in zip(self.quantities, self.rates)
+        ])
+        self.total_trips = sum(self.trip_amounts)
+
+        deductions = data.get('deductions', [])
+        self.deduction_descriptions = [ded.get('description', '') for ded in deductions]
+        self.deduction_dates = [ded.get('date', '') for ded in deductions]
+        self.deduction_amounts = array('q', [self._cents_or_zero(ded.get('amount', 0)) for ded in deductions])
+        # Deductions are sent signed (negative), so they are simply added.
+        self.total_deductions = sum(self.deduction_amounts)
+
+        ytd = data.get('ytd', {})
+        self.ytd_net = self._cents_or_zero(ytd.get('net', 0))
+        self.ytd_gross = self._cents_or_zero(ytd.get('gross', 0))
+        self.check_amount = self.total_trips + self.total_deductions
+
+    @staticmethod
+    def _cents_or_zero(value):
+        try:
+            return to_cents(value)
+        except ValueError:
+            return 0
+
+    def __len__(self):
+        return len(self.trip_amounts)
+
+    def trip_rows(self):
+        # Display rows for the trips grid, header not included. Text cells
+        # are strings whatever the payload sent: Table takes a list cell for
+        # flowables, and the canvas engine prints str() of every cell.
+        quantities = [format_fixed(q, QUANTITY_SCALE, 2) for q in self.quantities]
+        rates = [format_fixed(r, RATE_SCALE, 4) for r in self.rates]
+        amounts = [format_cents(a) for a in self.trip_amounts]
+        return [[str(date), str(number), str(route), str(description), quantity, rate, amount]
+                for date, number, route, description, quantity, rate, amount
+                in zip(self.trip_dates, self.trip_numbers, self.trip_routes, self.trip_descriptions,
+                       quantities, rates, amounts)]
+
+    def deduction_rows(self):
+        amounts = [format_cents(a) for a in self.deduction_amounts]
+        return [[str(description), str(date), amount]
+                for description, date, amount in zip(self.deduction_descriptions, self.deduction_dates, amounts)]
@@ -0,0 +1,84 @@
+# Statement preview without a PDF: POST a statement payload to
+# /api/preview and get back the numbers the PDF would show plus a small
+# HTML rendering of it, in a few milliseconds instead of a full render.
+#
+# Everything comes from PDFGenerator.prepare(), the same step generate()
+# runs before drawing, so a preview and the PDF can't disagree. Money is in
+# integer cents next to the formatted strings the PDF prints. Nothing is
+# recorded in the ledger; only a rendered statement is.
+from datetime import datetime
+from html import escape
+
+from api.model import format_cents
+
+# Trips shown in the HTML of a long statement; the JSON totals always cover
+# every trip.
+PREVIEW_HTML_ROWS = 500
+
+TOTALS = ('total_trips', 'total_deductions', 'check_amount', 'ytd_net', 'ytd_gross')
+
+
+def preview_statement(data, options=None):
+    from api.index import PDFGenerator
+    from api.ledger import get_ledger
+    # The ledger supplies missing YTD figures as it would for the PDF;
+    # prepare() never records.
+    generator = PDFGenerator(None, ledger=get_ledger(), **(options or {}))
+    content, layout = generator.prepare(data)
+    model = content['model']
+    totals = {name: content[name] for name in TOTALS}
+    return {
+        'layout': layout,
+        'trips': len(model),
+        'deductions': len(model.deduction_amounts),
+        'trip_amounts': list(model.trip_amounts),
+        'deduction_amounts': list(model.deduction_amounts),
+        'totals': totals,
+        'formatted': {name: format_cents(cents) for name, cents in totals.items()},
+        'ytd_source': content['ytd_source'],
+        'html': statement_html(content),
+    }
+
+
+def _cell(value, tag='td'):
+    # Line breaks in a cell (e.g. "1743657425.\n00") are kept, as in the PDF.
+    lines = str(value).split('\n')
+    return f"<{tag}>{'<br>'.join(escape(line) for line in lines)}</{tag}>"
+
+
+def _table(rows, limit=None):
+    header, body = rows[0], rows[1:]
+    out = ['<table border="1" cellspacing="0" cellpadding="3">',
+           '<tr>' + ''.join(_cell(label, 'th') for label in header) + '</tr>']
+    for row in body[:limit]:
+        out.append('<tr>' + ''.join(_cell(value) for value in row) + '</tr>')
+    if limit is not None and len(body) > limit:
+        out.append(f'<tr><td colspan="{len(header)}">... and {len(body) - limit} more</td></tr>')
+    out.append('</table>')
+    return out
+
+
+def statement_html(content):
+    # A fragment laid out like the PDF: header, recipient, trips, deductions
+    # and the summary. Every value is escaped.
+    info = content['statement_info']
+    date = info.get('date', datetime.now().strftime("%m/%d/%Y"))
+    truck = info.get('truck_number', "196")
+    out = ['<div class="statement-preview">',
+           f'<p><b>Date:</b> {escape(str(date))}<br><b>Truck #</b> {escape(str(truck))}</p>',
+           '<p>' + '<br>'.join(f'<b>{escape(str(line))}</b>' for line in content['recipient']) + '</p>',
+           '<p><b>Trips :</b></p>']
+    out += _table(content['trips'], PREVIEW_HTML_ROWS)
+    out.append(f"<p><b>Total:</b> {escape(format_cents(content['total_trips']))}</p>")
+    out.append('<p><b>Scheduled Deductions :</b></p>')
+    out += _table(content['deductions'])
+    out.append(f"<p><b>Total:</b> {escape(format_cents(content['total_deductions']))}</p>")
+    out.append(
+        '<table border="1" cellspacing="0" cellpadding="3">'
+        f"<tr><th>Total Net Year-To-Date :</th><td>{escape(format_cents(content['ytd_net']))}</td></tr>"
+        f"<tr><th>Total Gross Year-To-Date :</th><td>{escape(format_cents(content['ytd_gross']))}</td></tr>"
+        f"<tr><th>Check Amount:</th><td>{escape(format_cents(content['check_amount']))}</td></tr>"
+        '</table>')
+    out.append(f"<p>{escape(str(content['week_period']))}</p>")
+    out.append('</div>')
+    return '\n'.join(out)
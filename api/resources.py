@@ -0,0 +1,243 @@
+import copy
+import hashlib
+import os
+import threading
+import zlib
+
+from reportlab.lib import colors
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader, _digester
+from reportlab.pdfbase.pdfdoc import PDFImageXObject, PDFObjectReference, _mode2CS
+from reportlab.platypus import TableStyle
+
+LOGO_PATH = os.path.join(os.path.dirname(__file__), 'logo.png')
+# The letterhead fits the logo into this box, aspect ratio preserved.
+LOGO_BOX = (2.5 * inch, 1 * inch)
+# Resolution of the logo in compact statements (api/compact.py).
+COMPACT_LOGO_DPI = int(os.environ.get('STATEMENT_COMPACT_LOGO_DPI', 150))
+
+# Bump whenever a change to the statement layout should invalidate PDFs that
+# were cached or rendered by an earlier version.
+TEMPLATE_VERSION = '3'
+
+# Table styles never change between statements, so they are built once and
+# shared by every Table (setStyle only reads the command list).
+TRIPS_TABLE_COMMANDS = (
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('ALIGN', (2, 1), (3, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+)
+
+TOTAL_TABLE_COMMANDS = (
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
+    ('GRID', (1, 0), (1, 0), 0.5, colors.black),
+)
+
+SUBTOTAL_TABLE_COMMANDS = (
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('ALIGN', (3, 0), (3, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (1, 0), (1, 0), 0.5, colors.black),
+    ('GRID', (3, 0), (3, 0), 0.5, colors.black),
+)
+
+DEDUCTIONS_TABLE_COMMANDS = (
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+)
+
+# Fleet summary of a consolidated statement; the last row holds the totals.
+FLEET_TABLE_COMMANDS = (
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+)
+
+SUMMARY_TABLE_COMMANDS = (
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('TEXTCOLOR', (1, 0), (1, 1), colors.blue),
+    ('TEXTCOLOR', (3, 1), (3, 1), colors.red),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (2, 1), 'RIGHT'),
+    ('ALIGN', (3, 1), (3, 1), 'CENTER'),
+    ('GRID', (3, 1), (3, 1), 0.5, colors.black),
+)
+
+
+class BinaryImageXObject(PDFImageXObject):
+    # PDFImageXObject stores deflated pixels ASCII85-encoded when
+    # rl_config.useA85 is on (the default). Without ReportLab's C extension
+    # that encode is a pure-Python pass over the whole image, the slowest part
+    # of a cold start; binary Flate data is also a fifth smaller.
+    def loadImageFromSRC(self, im):
+        if im.jpeg_fh():
+            return PDFImageXObject.loadImageFromSRC(self, im)
+        self.width, self.height = im.getSize()
+        self.streamContent = zlib.compress(im.getRGBData())
+        self._filters = ('FlateDecode',)
+        self.colorSpace = _mode2CS[im.mode]
+        self.bitsPerComponent = 8
+        if self.mask == 'auto' and im._dataA:
+            self.mask = None
+            self._smask = BinaryImageXObject(_digester(im._dataA.getRGBData()), im._dataA)
+            self._smask._decode = [0, 1]
+        else:
+            self._checkTransparency(im)
+
+
+class CachedImage:
+    # An image decoded and PDF-encoded once per process. Each document gets a
+    # shallow copy of the encoded XObject, so the pixel data is shared and
+    # never decoded or deflated again. `source` is a path or a PIL image.
+    def __init__(self, source):
+        reader = ImageReader(source)
+        self.width, self.height = reader.getSize()
+        self.name = _digester(reader.getRGBData() + b'auto')
+        self._xobject = BinaryImageXObject(self.name, reader, mask='auto')
+        self._smask = self._xobject.__dict__.pop('_smask', None)
+        if self._smask is not None:
+            self._smask_name = self._smask.name
+
+    def draw(self, canvas, x, y, width, height, anchor='c'):
+        doc = canvas._doc
+        reg_name = doc.getXObjectName(self.name)
+        if reg_name not in doc.idToObject:
+            xobject = copy.copy(self._xobject)
+            if self._smask is not None:
+                smask_reg_name = doc.getXObjectName(self._smask_name)
+                if smask_reg_name not in doc.idToObject:
+                    doc.Reference(copy.copy(self._smask), smask_reg_name)
+                xobject.smask = PDFObjectReference(smask_reg_name)
+            doc.Reference(xobject, reg_name)
+            doc.addForm(self.name, xobject)
+
+        # Same placement as canvas.drawImage(..., preserveAspectRatio=True).
+        x, y, width, height, _ = aspectRatioFix(True, anchor, x, y, width, height, self.width, self.height)
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.scale(width, height)
+        canvas._code.append("/%s Do" % reg_name)
+        canvas.restoreState()
+        canvas._formsinuse.append(self.name)
+        canvas._currentPageHasImages = 1
+
+
+def downscaled_image(path, box, dpi):
+    # The image at `path` resampled to `dpi` at the size it is drawn in `box`
+    # (never upscaled), as a PIL image. A fully opaque alpha channel is
+    # dropped, so the PDF needs no soft mask.
+    from PIL import Image
+    image = Image.open(path)
+    image.load()
+    scale = min(box[0] / image.width, box[1] / image.height) / 72 * dpi
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if image.mode in ('RGBA', 'LA') and image.getchannel('A').getextrema() == (255, 255):
+        image = image.convert('RGB' if image.mode == 'RGBA' else 'L')
+    return image
+
+
+class Resources:
+    def __init__(self, logo_path=LOGO_PATH):
+        self.logo_path = logo_path
+        self.logo_mtime = None
+        self.logo = None
+        self._compact_logo = None
+        self._compact_lock = threading.Lock()
+        if os.path.exists(logo_path):
+            self.logo_mtime = os.path.getmtime(logo_path)
+            try:
+                self.logo = CachedImage(logo_path)
+            except Exception:
+                # Unreadable logo: the header falls back to the company name.
+                self.logo = None
+
+        self.styles = getSampleStyleSheet()
+        self.normal_style = self.styles["Normal"]
+        self.bold_style = ParagraphStyle('Bold', parent=self.normal_style, fontName='Helvetica-Bold', fontSize=10)
+
+        # Identifies what a statement looks like (layout version and logo), so
+        # caches can tell when a stored PDF is stale.
+        logo_id = self.logo.name if self.logo is not None else 'no-logo'
+        self.fingerprint = hashlib.sha256(
+            f"{TEMPLATE_VERSION}:{logo_id}:{COMPACT_LOGO_DPI}".encode()).hexdigest()[:16]
+
+        self.trips_table_style = TableStyle(TRIPS_TABLE_COMMANDS)
+        self.total_table_style = TableStyle(TOTAL_TABLE_COMMANDS)
+        self.subtotal_table_style = TableStyle(SUBTOTAL_TABLE_COMMANDS)
+        self.deductions_table_style = TableStyle(DEDUCTIONS_TABLE_COMMANDS)
+        self.summary_table_style = TableStyle(SUMMARY_TABLE_COMMANDS)
+        self.fleet_table_style = TableStyle(FLEET_TABLE_COMMANDS)
+
+    def compact_logo(self):
+        # The logo for compact statements, resampled on first use: only
+        # processes that render them pay for it.
+        if self.logo is None:
+            return None
+        if self._compact_logo is None:
+            with self._compact_lock:
+                if self._compact_logo is None:
+                    self._compact_logo = CachedImage(downscaled_image(self.logo_path, LOGO_BOX, COMPACT_LOGO_DPI))
+        return self._compact_logo
+
+
+# Loaded on first use and then shared by every render in this process.
+_resources = None
+_lock = threading.Lock()
+
+
+def get_resources():
+    global _resources
+    if _resources is None:
+        with _lock:
+            if _resources is None:
+                _resources = Resources()
+    return _resources
+
+
+def reload_resources(logo_path=None):
+    # Rebuilds everything, e.g. after api/logo.png was replaced. Renders
+    # already in progress keep the registry they started with.
+    global _resources
+    fresh = Resources(logo_path or (_resources.logo_path if _resources else LOGO_PATH))
+    with _lock:
+        _resources = fresh
+    return fresh
+
+
+def reload_if_logo_changed():
+    # Explicit, cheap check for long-running servers; a single stat call.
+    current = get_resources()
+    path = current.logo_path
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if mtime != current.logo_mtime:
+        return reload_resources(path)
+    return current
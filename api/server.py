@@ -0,0 +1,361 @@
+# Pre-forked HTTP server for running the statement API on-prem:
+#
+#     python -m api.server --port 8000 --workers 4 --connections 8
+#
+# Rendering is CPU-bound, so the master forks --workers processes that
+# accept from one shared listening socket; each serves up to --connections
+# connections at a time on its own threads (HTTP/1.1 keep-alive, idle
+# connections closed after --keepalive seconds). A worker that has handled
+# --max-requests requests stops accepting, finishes what it has and exits,
+# and the master starts a fresh one in its slot. SIGTERM or Ctrl-C drains
+# every worker for up to --grace seconds before killing it.
+#
+# Besides the API routes, every worker answers GET /healthz and GET /metrics
+# (request counts, in-flight requests, queue depth and throughput for all
+# workers, read from shared memory). Job workers (api/jobs.py) are run by the
+# master, not by each server worker.
+import argparse
+import os
+import queue
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing import RawArray
+from urllib.parse import urlparse
+
+from api.index import handler
+
+# Per-slot counters in shared memory, one row of FIELDS doubles per worker
+# slot followed by a ring of per-second request counts for the throughput.
+PID, STARTED, SPAWNS, REQUESTS, ERRORS, BUSY_SECONDS, IN_FLIGHT, CONNECTIONS, PENDING = range(9)
+FIELDS = 9
+WINDOW = 60
+
+
+class SharedStats:
+    # Created by the master before forking; each slot is written only by the
+    # worker process that owns it (under that process's lock) and read by
+    # whichever worker answers /metrics.
+    def __init__(self, slots):
+        self.slots = slots
+        self.row = FIELDS + 2 * WINDOW
+        self.values = RawArray('d', slots * self.row)
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def _index(self, slot, field):
+        return slot * self.row + field
+
+    def get(self, slot, field):
+        return self.values[self._index(slot, field)]
+
+    def add(self, slot, field, amount=1):
+        with self.lock:
+            self.values[self._index(slot, field)] += amount
+
+    def spawned(self, slot, pid):
+        # Cumulative counters survive recycling; live gauges start over.
+        for field, value in ((PID, pid), (STARTED, time.time()), (IN_FLIGHT, 0), (CONNECTIONS, 0), (PENDING, 0)):
+            self.values[self._index(slot, field)] = value
+        self.values[self._index(slot, SPAWNS)] += 1
+
+    def request_done(self, slot, status, seconds):
+        now = int(time.time())
+        ring = self._index(slot, FIELDS)
+        bucket = now % WINDOW
+        with self.lock:
+            self.values[self._index(slot, REQUESTS)] += 1
+            self.values[self._index(slot, BUSY_SECONDS)] += seconds
+            if status is None or status >= 500:
+                self.values[self._index(slot, ERRORS)] += 1
+            if self.values[ring + WINDOW + bucket] != now:
+                self.values[ring + WINDOW + bucket] = now
+                self.values[ring + bucket] = 0
+            self.values[ring + bucket] += 1
+
+    def _recent(self, slot, seconds, now):
+        ring = self._index(slot, FIELDS)
+        return sum(self.values[ring + i] for i in range(WINDOW)
+                   if now - seconds < self.values[ring + WINDOW + i] <= now)
+
+    def snapshot(self):
+        now = int(time.time())
+        workers = []
+        for slot in range(self.slots):
+            requests = self.get(slot, REQUESTS)
+            workers.append({
+                'slot': slot,
+                'pid': int(self.get(slot, PID)),
+                'started': self.get(slot, STARTED),
+                'spawns': int(self.get(slot, SPAWNS)),
+                'requests': int(requests),
+                'errors': int(self.get(slot, ERRORS)),
+                'in_flight': int(self.get(slot, IN_FLIGHT)),
+                'connections': int(self.get(slot, CONNECTIONS)),
+                'pending': int(self.get(slot, PENDING)),
+                'mean_ms': round(self.get(slot, BUSY_SECONDS) / requests * 1000, 2) if requests else None,
+                'last_10s': int(self._recent(slot, 10, now)),
+                'last_60s': int(self._recent(slot, 60, now)),
+            })
+        uptime = time.time() - self.started
+        total = sum(w['requests'] for w in workers)
+        return {
+            'uptime': round(uptime, 1),
+            'requests': total,
+            'errors': sum(w['errors'] for w in workers),
+            'in_flight': sum(w['in_flight'] for w in workers),
+            # Accepted connections waiting for a free connection thread.
+            'queue_depth': sum(w['pending'] for w in workers),
+            'connections': sum(w['connections'] for w in workers),
+            'throughput': {
+                'last_10s_rps': round(sum(w['last_10s'] for w in workers) / 10, 2),
+                'last_60s_rps': round(sum(w['last_60s'] for w in workers) / 60, 2),
+                'overall_rps': round(total / uptime, 2) if uptime else 0.0,
+            },
+            'workers': workers,
+        }
+
+
+def job_queue_depth():
+    # Counts per status of the async job queue, if this host has one.
+    from api.jobs import JobQueue, DEFAULT_DB
+    path = os.environ.get('STATEMENT_JOBS_DB') or DEFAULT_DB
+    if not os.path.exists(path):
+        return None
+    return JobQueue(path).counts()
+
+
+class ServerHandler(handler):
+    # The API handler plus health and metrics routes, per-request accounting
+    # and "Connection: close" while the worker is draining.
+    def setup(self):
+        self.timeout = self.server.keepalive
+        handler.setup(self)
+
+    def handle_one_request(self):
+        self.request_started = None
+        self.response_status = None
+        try:
+            handler.handle_one_request(self)
+        finally:
+            if self.request_started is not None:
+                self.server.stats.add(self.server.slot, IN_FLIGHT, -1)
+                self.server.request_done(self.response_status, time.perf_counter() - self.request_started)
+
+    def parse_request(self):
+        # Called once a request line has arrived, so idle keep-alive time
+        # isn't counted as a request in flight.
+        self.request_started = time.perf_counter()
+        self.server.stats.add(self.server.slot, IN_FLIGHT)
+        return handler.parse_request(self)
+
+    def end_headers(self):
+        if self.server.draining and not self.close_connection:
+            self.send_header('Connection', 'close')
+        handler.end_headers(self)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path.endswith('/healthz'):
+            return self._send_json(200, {'status': 'draining' if self.server.draining else 'ok',
+                                         'pid': os.getpid(), 'slot': self.server.slot})
+        if path.endswith('/metrics'):
+            metrics = self.server.stats.snapshot()
+            metrics['jobs'] = job_queue_depth()
+            return self._send_json(200, metrics)
+        return handler.do_GET(self)
+
+
+class Worker:
+    # One pre-forked process: an accept loop feeding a bounded queue that
+    # `connections` threads serve. When every thread is busy and the queue is
+    # full the loop stops accepting, leaving new connections in the kernel
+    # backlog for a less busy worker to pick up.
+    def __init__(self, sock, slot, stats, connections, max_requests, keepalive, grace):
+        self.sock = sock
+        self.slot = slot
+        self.stats = stats
+        self.connections = connections
+        self.keepalive = keepalive
+        self.grace = grace
+        # Jitter so workers started together don't all recycle together.
+        self.max_requests = max_requests + random.randint(0, max_requests // 10) if max_requests else 0
+        self.requests = 0
+        self.draining = False
+        self.pending = queue.Queue(maxsize=connections)
+        self._lock = threading.Lock()
+
+    def drain(self, *_):
+        self.draining = True
+
+    def request_done(self, status, seconds):
+        self.stats.request_done(self.slot, status, seconds)
+        with self._lock:
+            self.requests += 1
+            if self.max_requests and self.requests >= self.max_requests:
+                self.draining = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.drain)
+        # Ctrl-C reaches the whole process group; the master decides.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        threads = [threading.Thread(target=self._serve, daemon=True) for _ in range(self.connections)]
+        for thread in threads:
+            thread.start()
+
+        while not self.draining:
+            try:
+                ready, _, _ = select.select([self.sock], [], [], 0.5)
+            except InterruptedError:
+                continue
+            if not ready:
+                continue
+            try:
+                conn, address = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                # Another worker took it.
+                continue
+            self.stats.add(self.slot, PENDING)
+            self.pending.put((conn, address))
+
+        # Stop accepting; this process's copy of the listening socket goes,
+        # the other workers keep theirs.
+        self.sock.close()
+        for _ in threads:
+            self.pending.put(None)
+        deadline = time.monotonic() + self.grace
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def _serve(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            conn, address = item
+            self.stats.add(self.slot, PENDING, -1)
+            self.stats.add(self.slot, CONNECTIONS)
+            try:
+                ServerHandler(conn, address, self)
+            except Exception as e:
+                sys.stderr.write(f"worker {self.slot}: connection from {address[0]} failed: {e!r}\n")
+            finally:
+                self.stats.add(self.slot, CONNECTIONS, -1)
+                try:
+                    conn.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                conn.close()
+
+
+class Master:
+    def __init__(self, args):
+        self.args = args
+        self.stats = SharedStats(args.workers)
+        self.children = {}
+        self.stopping = False
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # Reset the slot before accepting anything.
+                self.stats.spawned(slot, os.getpid())
+                # Job workers belong to the master.
+                os.environ['STATEMENT_JOB_WORKERS'] = '0'
+                Worker(self.sock, slot, self.stats, self.args.connections, self.args.max_requests,
+                       self.args.keepalive, self.args.grace).run()
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def serve(self):
+        args = self.args
+        self.sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+        self.sock.setblocking(False)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        from api import jobs
+        if args.job_workers is not None:
+            os.environ['STATEMENT_JOB_WORKERS'] = str(args.job_workers)
+        job_workers = jobs.ensure_workers()
+        if job_workers:
+            # Inherited by the server workers: GET /api/jobs tells the web
+            # form it may queue long statements here.
+            os.environ.setdefault('STATEMENT_JOBS_ENABLED', '1')
+
+        # api.index (fonts, logo, styles) is already loaded, so the workers
+        # share those pages with the master.
+        for slot in range(args.workers):
+            self.spawn(slot)
+        host, port = self.sock.getsockname()[:2]
+        print(f"serving on http://{host}:{port} with {args.workers} workers x {args.connections} "
+              f"connections, {job_workers} job workers (pid {os.getpid()})", flush=True)
+
+        while not self.stopping:
+            time.sleep(0.2)
+            for pid, (slot, started) in list(self.children.items()):
+                if os.waitpid(pid, os.WNOHANG)[0] == 0:
+                    continue
+                del self.children[pid]
+                if self.stopping:
+                    break
+                if time.monotonic() - started < 1:
+                    # Dying straight after start: don't spin.
+                    time.sleep(1)
+                self.spawn(slot)
+            if job_workers:
+                jobs.ensure_workers()
+
+        print("shutting down: draining workers", flush=True)
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + args.grace + 1
+        while self.children and time.monotonic() < deadline:
+            for pid in list(self.children):
+                if os.waitpid(pid, os.WNOHANG)[0] != 0:
+                    del self.children[pid]
+            time.sleep(0.1)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.sock.close()
+        jobs.stop_workers(args.grace)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-forked server for the statement API.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--connections', type=int, default=8, help="concurrent connections per worker")
+    parser.add_argument('--max-requests', type=int, default=1000,
+                        help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument('--keepalive', type=float, default=5.0, help="idle keep-alive timeout in seconds")
+    parser.add_argument('--grace', type=float, default=30.0, help="seconds to finish requests on shutdown")
+    parser.add_argument('--backlog', type=int, default=128)
+    parser.add_argument('--job-workers', type=int, default=None,
+                        help="async job workers run by the master (default: $STATEMENT_JOB_WORKERS or 2; 0 = none)")
+    args = parser.parse_args(argv)
+    Master(args).serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
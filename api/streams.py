@@ -0,0 +1,162 @@
+# Incremental request/response bodies for the handler. Both classes work on
+# the raw rfile/wfile of a BaseHTTPRequestHandler and never hold more than
+# one block (or one NDJSON line) in memory.
+
+BLOCK_SIZE = 64 * 1024
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+class RequestBody:
+    # limit caps what read() returns and the length of each iter_lines()
+    # line; a Content-Length over it is refused before anything is read.
+    def __init__(self, rfile, headers, block_size=BLOCK_SIZE, limit=None):
+        self.rfile = rfile
+        self.block_size = block_size
+        self.limit = limit
+        self.chunked = 'chunked' in headers.get('Transfer-Encoding', '').lower()
+        try:
+            self.length = int(headers.get('Content-Length', 0) or 0)
+        except ValueError:
+            raise ValueError("malformed Content-Length")
+        if self.length < 0:
+            raise ValueError("malformed Content-Length")
+        # True once the whole body has been consumed, i.e. the connection is
+        # positioned at the next request.
+        self.complete = False
+
+    def _too_large(self):
+        return BodyTooLarge(f"request body exceeds the limit of {self.limit} bytes")
+
+    def read(self):
+        # The whole body, read block by block so an oversized chunked body
+        # is refused as soon as it passes the limit.
+        if self.limit is not None and not self.chunked and self.length > self.limit:
+            raise self._too_large()
+        body = bytearray()
+        for block in self.iter_blocks():
+            body += block
+            if self.limit is not None and len(body) > self.limit:
+                raise self._too_large()
+        return body
+
+    def iter_blocks(self):
+        if self.chunked:
+            yield from self._iter_chunks()
+            self.complete = True
+            return
+        remaining = self.length
+        while remaining > 0:
+            block = self.rfile.read(min(self.block_size, remaining))
+            if not block:
+                raise ValueError("request body ended before Content-Length bytes")
+            remaining -= len(block)
+            yield block
+        self.complete = True
+
+    def _iter_chunks(self):
+        while True:
+            size_line = self.rfile.readline(1024)
+            try:
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise ValueError("malformed chunked request body")
+            if size == 0:
+                # Skip trailers up to the blank line that ends the body.
+                while self.rfile.readline(1024) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            while size > 0:
+                block = self.rfile.read(min(self.block_size, size))
+                if not block:
+                    raise ValueError("request body ended inside a chunk")
+                size -= len(block)
+                yield block
+            self.rfile.readline(1024)
+
+    def iter_lines(self):
+        # Yields complete lines without the trailing newline; a body that
+        # doesn't end in a newline still yields its last line.
+        pending = bytearray()
+        for block in self.iter_blocks():
+            pending += block
+            start = 0
+            while True:
+                end = pending.find(b'\n', start)
+                if end < 0:
+                    break
+                if self.limit is not None and end - start > self.limit:
+                    raise self._too_large()
+                yield bytes(pending[start:end])
+                start = end + 1
+            del pending[:start]
+            if self.limit is not None and len(pending) > self.limit:
+                raise self._too_large()
+        if pending:
+            yield bytes(pending)
+
+
+class PDFBuffer:
+    # Write-only stand-in for BytesIO as the canvas output file. ReportLab
+    # assembles the whole PDF as one bytes object and writes it in a single
+    # call; BytesIO would copy it, this keeps a reference, so the finished
+    # document exists once in memory.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data if type(data) is bytes else bytes(data))
+        return len(data)
+
+    def getvalue(self):
+        if len(self.chunks) != 1:
+            self.chunks = [b''.join(self.chunks)]
+        return self.chunks[0]
+
+    def getbuffer(self):
+        return memoryview(self.getvalue())
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def close(self):
+        self.chunks = []
+
+
+class ChunkedWriter:
+    # File-like sink that frames everything written to it as HTTP/1.1
+    # chunked transfer encoding. Small writes are coalesced into blocks so
+    # the client doesn't get one chunk per zip header. With chunked=False it
+    # just passes bytes through (HTTP/1.0 clients, close-delimited body).
+    def __init__(self, wfile, chunked=True, block_size=BLOCK_SIZE):
+        self.wfile = wfile
+        self.chunked = chunked
+        self.block_size = block_size
+        self.pending = bytearray()
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= self.block_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.chunked:
+            self.wfile.write(b'%x\r\n' % len(self.pending))
+        self.wfile.write(self.pending)
+        if self.chunked:
+            self.wfile.write(b'\r\n')
+        self.wfile.flush()
+        self.bytes_written += len(self.pending)
+        self.pending = bytearray()
+
+    def close(self):
+        self.flush()
+        if self.chunked:
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
@@ -0,0 +1,92 @@
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Set STATEMENT_PROFILE=1 to profile every statement request, or set
+# STATEMENT_PROFILE_TOKEN and send the same value in PROFILE_HEADER to
+# profile just that request. Profiles are written to STATEMENT_PROFILE_DIR
+# (default: the temp directory) for `python -m pstats` or snakeviz.
+PROFILE_HEADER = 'X-Statement-Profile'
+
+_profile_count = 0
+_profile_lock = threading.Lock()
+
+
+class PhaseTimer:
+    # Wall time per named phase of one request. Phases nest and the time is
+    # exclusive: while a nested phase runs the enclosing one is paused, so
+    # "layout" does not include the "header" calls made from inside
+    # doc.build. A phase entered several times (one header per page)
+    # accumulates.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self._add(outer[0], now - outer[1])
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start = self._stack.pop()
+            self._add(name, now - start)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_ms(self):
+        return {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+
+    def server_timing(self):
+        # Server-Timing header value, e.g. "read;dur=0.08, parse;dur=0.31, ...,
+        # total;dur=14.2". Anything after the headers are sent (writing the
+        # body) can't be included and only shows up in the log record.
+        metrics = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ', '.join(metrics)
+
+
+def log_event(record):
+    # One JSON object per line on stderr, which the function runtime collects
+    # alongside the access log.
+    sys.stderr.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+    sys.stderr.flush()
+
+
+def profile_requested(headers):
+    if os.environ.get('STATEMENT_PROFILE', '') not in ('', '0'):
+        return True
+    token = os.environ.get('STATEMENT_PROFILE_TOKEN')
+    sent = headers.get(PROFILE_HEADER)
+    # Only with a configured token: profiling slows the request down several
+    # times over and writes to disk, so it can't be open to any client.
+    return bool(token and sent) and hmac.compare_digest(token.encode(), sent.encode())
+
+
+def dump_profile(profiler):
+    global _profile_count
+    with _profile_lock:
+        _profile_count += 1
+        count = _profile_count
+    directory = os.environ.get('STATEMENT_PROFILE_DIR') or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"statement-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{count}.prof"
+    path = os.path.join(directory, name)
+    profiler.dump_stats(path)
+    return path
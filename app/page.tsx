@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 
 // Types
 interface Trip {
@@ -24,6 +24,34 @@ interface YTD {
   gross: number;
 }
 
+interface RenderJob {
+  id: string;
+  status: 'queued' | 'running' | 'done' | 'failed' | 'expired';
+  error: string | null;
+  status_url: string;
+  pdf_url: string;
+}
+
+interface JobsConfig {
+  enabled: boolean;
+  min_trips: number;
+}
+
+interface StatementPreview {
+  layout: string;
+  trips: number;
+  deductions: number;
+  formatted: {
+    total_trips: string;
+    total_deductions: string;
+    check_amount: string;
+    ytd_net: string;
+    ytd_gross: string;
+  };
+  ytd_source: 'payload' | 'ledger';
+  html: string;
+}
+
 interface StatementData {
   recipient: {
     name: string;
@@ -40,6 +68,17 @@ interface StatementData {
   ytd: YTD;
 }
 
+// Statements are rendered inside the request unless the deployment runs job
+// workers (GET /api/jobs says so; never on Vercel, where the queue can't
+// work): then statements over its min_trips are queued (POST /api/jobs) and
+// polled, for at most JOB_DEADLINE_MS.
+const JOB_POLL_MS = 1000;
+const JOB_DEADLINE_MS = 10 * 60 * 1000;
+
+// The preview (POST /api/preview: totals and an HTML rendering, no PDF) is
+// refreshed this long after the last edit.
+const PREVIEW_DEBOUNCE_MS = 300;
+
 const initialData: StatementData = {
   recipient: {
     name: "FITRIGHT LOGISTICS LLC",
@@ -78,6 +117,44 @@ const initialData: StatementData = {
 export default function Home() {
   const [data, setData] = useState<StatementData>(initialData);
   const [loading, setLoading] = useState(false);
+  const [jobStatus, setJobStatus] = useState<string | null>(null);
+  const [jobsConfig, setJobsConfig] = useState<JobsConfig | null>(null);
+  const [preview, setPreview] = useState<StatementPreview | null>(null);
+  const [previewError, setPreviewError] = useState<string | null>(null);
+
+  useEffect(() => {
+    fetch('/api/jobs')
+      .then(response => (response.ok ? response.json() : null))
+      .then(config => setJobsConfig(config))
+      .catch(() => setJobsConfig(null));
+  }, []);
+
+  useEffect(() => {
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch('/api/preview', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(data),
+          signal: controller.signal,
+        });
+        if (!response.ok) {
+          const body = await response.json().catch(() => null);
+          throw new Error(body?.error || `Preview failed (${response.status})`);
+        }
+        setPreview(await response.json());
+        setPreviewError(null);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        setPreviewError(error instanceof Error ? error.message : String(error));
+      }
+    }, PREVIEW_DEBOUNCE_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [data]);
 
   const handleRecipientChange = (field: string, value: string) => {
     setData(prev => ({
@@ -152,9 +229,55 @@ export default function Home() {
     }));
   };
 
+  const downloadPDF = (blob: Blob) => {
+    const url = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = `statement_${data.statement_info.truck_number}_${data.statement_info.date.replace(/\//g, '-')}.pdf`;
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+    window.URL.revokeObjectURL(url);
+  };
+
+  const renderAsJob = async () => {
+    const submitted = await fetch('/api/jobs', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(data),
+    });
+    if (!submitted.ok) throw new Error(`Failed to submit job (${submitted.status})`);
+    let job: RenderJob = await submitted.json();
+    setJobStatus(job.status);
+
+    const deadline = Date.now() + JOB_DEADLINE_MS;
+    while (job.status !== 'done') {
+      if (job.status === 'failed' || job.status === 'expired') {
+        throw new Error(job.error || `Job ${job.status}`);
+      }
+      if (Date.now() > deadline) {
+        throw new Error(`Job ${job.id} still ${job.status} after ${JOB_DEADLINE_MS / 60000} minutes`);
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_MS));
+      const polled = await fetch(job.status_url);
+      if (!polled.ok) throw new Error(`Failed to poll job (${polled.status})`);
+      job = await polled.json();
+      setJobStatus(job.status);
+    }
+
+    const pdf = await fetch(job.pdf_url);
+    if (!pdf.ok) throw new Error(`Failed to download job PDF (${pdf.status})`);
+    downloadPDF(await pdf.blob());
+  };
+
   const generatePDF = async () => {
     setLoading(true);
     try {
+      if (jobsConfig?.enabled && data.trips.length > jobsConfig.min_trips) {
+        await renderAsJob();
+        return;
+      }
+
       const response = await fetch('/api/index.py', { // Vercel might route /api/index.py or just /api depending on config. Trying direct path first or /api/
         method: 'POST',
         headers: {
@@ -171,30 +294,17 @@ export default function Home() {
             body: JSON.stringify(data),
          });
          if(!response2.ok) throw new Error('Failed to generate PDF');
-         const blob = await response2.blob();
-         const url = window.URL.createObjectURL(blob);
-         const a = document.createElement('a');
-         a.href = url;
-         a.download = `statement_${data.statement_info.truck_number}_${data.statement_info.date.replace(/\//g, '-')}.pdf`;
-         document.body.appendChild(a);
-         a.click();
-         a.remove();
+         downloadPDF(await response2.blob());
          return;
       }
 
-      const blob = await response.blob();
-      const url = window.URL.createObjectURL(blob);
-      const a = document.createElement('a');
-      a.href = url;
-      a.download = `statement_${data.statement_info.truck_number}_${data.statement_info.date.replace(/\//g, '-')}.pdf`;
-      document.body.appendChild(a);
-      a.click();
-      a.remove();
+      downloadPDF(await response.blob());
     } catch (error) {
       console.error(error);
       alert('Error generating PDF. Please check the console.');
     } finally {
       setLoading(false);
+      setJobStatus(null);
     }
   };
 
@@ -308,6 +418,25 @@ export default function Home() {
               </div>
             </div>
 
+            {/* Preview */}
+            <div>
+              <h3 className="text-lg font-medium text-gray-900 border-b pb-2 mb-4">Preview</h3>
+              {previewError && <p className="text-sm text-red-600 mb-2">{previewError}</p>}
+              {preview && (
+                <div className="space-y-4">
+                  <div className="grid grid-cols-2 md:grid-cols-5 gap-4 text-sm">
+                    <div><span className="text-xs text-gray-500 block">Trips total</span>{preview.formatted.total_trips}</div>
+                    <div><span className="text-xs text-gray-500 block">Deductions</span>{preview.formatted.total_deductions}</div>
+                    <div><span className="text-xs text-gray-500 block">Net YTD{preview.ytd_source === 'ledger' ? ' (ledger)' : ''}</span>{preview.formatted.ytd_net}</div>
+                    <div><span className="text-xs text-gray-500 block">Gross YTD{preview.ytd_source === 'ledger' ? ' (ledger)' : ''}</span>{preview.formatted.ytd_gross}</div>
+                    <div><span className="text-xs text-gray-500 block">Check Amount</span><span className="font-bold">{preview.formatted.check_amount}</span></div>
+                  </div>
+                  {/* Every value in the HTML is escaped by the server (api/preview.py). */}
+                  <div className="overflow-x-auto text-xs border rounded p-3" dangerouslySetInnerHTML={{ __html: preview.html }} />
+                </div>
+              )}
+            </div>
+
             {/* Action */}
             <div className="pt-6 border-t flex justify-end">
               <button 
@@ -315,7 +444,7 @@ export default function Home() {
                 disabled={loading}
                 className={`px-6 py-3 bg-blue-600 text-white font-medium rounded shadow-sm hover:bg-blue-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-blue-500 ${loading ? 'opacity-50 cursor-not-allowed' : ''}`}
               >
-                {loading ? 'Generating...' : 'Generate PDF'}
+                {loading ? (jobStatus ? `Rendering in background (${jobStatus})...` : 'Generating...') : 'Generate PDF'}
               </button>
             </div>
 
@@ -0,0 +1,226 @@
+"""Offline benchmark suite for statement rendering.
+
+Renders synthetic statements (bench/payloads.py) for every combination of
+trip and deduction counts, through PDFGenerator directly and through the
+HTTP handler, and records per case:
+
+    wall_ms          median render time (for the handler: POST to last byte)
+    peak_rss_kb      peak resident set size of the process rendering the case
+    alloc_peak_kb    peak traced Python allocations for one render
+    bytes, pages     size and page count of the PDF
+
+Each case runs in its own interpreter so peak RSS belongs to that case alone.
+The PDF cache is disabled, so every request renders.
+
+    python bench/benchmarks.py --output results.json
+    python bench/benchmarks.py --update-baseline          # store bench/baseline.json
+    python bench/benchmarks.py --threshold 0.10           # compare against it
+
+Exits non-zero when a metric is worse than the baseline by more than the
+threshold (and by more than its noise floor). Without bench/baseline.json
+there is nothing to compare against and only the results are printed; a
+--baseline given explicitly has to exist.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'bench', 'baseline.json')
+
+METRICS = ('wall_ms', 'peak_rss_kb', 'alloc_peak_kb', 'bytes', 'pages')
+# Differences smaller than these are noise, whatever the relative change:
+# a 1-trip render moves by a millisecond or two between runs.
+NOISE_FLOOR = {'wall_ms': 2.0, 'peak_rss_kb': 2048, 'alloc_peak_kb': 256, 'bytes': 0, 'pages': 0}
+
+PAGE_OBJECT = re.compile(rb'/Type /Page\b(?!s)')
+
+
+def count_pages(pdf):
+    return len(PAGE_OBJECT.findall(pdf))
+
+
+def case_name(path, engine, trips, deductions):
+    return f"{path}/{engine}/{trips}t-{deductions}d"
+
+
+def run_case(path, engine, trips, deductions, repeat):
+    # Runs in the child interpreter; returns the metrics for one case.
+    import io
+    import resource
+    import statistics
+    import time
+    import tracemalloc
+
+    from reportlab import rl_config
+    from api.index import PDFGenerator
+    from bench.payloads import synthetic_payload
+
+    # Fixed document ID and creation date, so byte sizes are comparable.
+    rl_config.invariant = 1
+    payload = synthetic_payload(trips, deductions)
+    # Warm imports, fonts and the resource registry on a small statement so
+    # they aren't charged to the first timed render.
+    PDFGenerator(io.BytesIO(), engine=engine).generate(synthetic_payload(1))
+
+    if path == 'direct':
+        def render():
+            buffer = io.BytesIO()
+            PDFGenerator(buffer, engine=engine).generate(payload)
+            return buffer.getvalue()
+    else:
+        import http.client
+        import threading
+        from http.server import ThreadingHTTPServer
+        from api.index import handler
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+        body = json.dumps(payload).encode('utf-8')
+
+        def render():
+            conn.request('POST', f'/api/index.py?engine={engine}', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            pdf = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"handler answered {response.status}: {pdf[:200]!r}")
+            return pdf
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = render()
+        times.append(time.perf_counter() - start)
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Allocations are traced in a separate render: tracing slows Python
+    # down several times over, so it can't share a run with the timings.
+    # For the handler this includes the server thread's allocations.
+    tracemalloc.start()
+    render()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'wall_ms': round(statistics.median(times) * 1000, 2),
+        'peak_rss_kb': peak_rss_kb,
+        'alloc_peak_kb': alloc_peak // 1024,
+        'bytes': len(pdf),
+        'pages': count_pages(pdf),
+    }
+
+
+def spawn_case(path, engine, trips, deductions, repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT, STATEMENT_CACHE_BYTES='0')
+    env.pop('STATEMENT_CACHE_DIR', None)
+    # The handler records what it issues; synthetic statements for the
+    # sample's truck mustn't land in a real ledger.
+    env.pop('STATEMENT_LEDGER_DB', None)
+    args = [sys.executable, os.path.abspath(__file__), '--child',
+            path, engine, str(trips), str(deductions), str(repeat)]
+    out = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"{case_name(path, engine, trips, deductions)} failed:\n{out.stderr}")
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def environment():
+    import reportlab
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'reportlab': reportlab.Version,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def compare(results, baseline, threshold):
+    # Returns (case, metric, baseline value, new value) for every regression.
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in METRICS:
+            if metric not in old:
+                continue
+            before, after = old[metric], metrics[metric]
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR[metric]:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', default='1,10,100,1000,10000', help="comma separated trip counts")
+    parser.add_argument('--deductions', default='1,10,50', help="comma separated deduction counts")
+    parser.add_argument('--paths', default='direct,handler', help="direct, handler or both")
+    parser.add_argument('--engines', default='platypus', help="platypus, canvas or both")
+    parser.add_argument('--repeat', type=int, default=3, help="timed renders per case")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help=f"baseline to compare against (default: {DEFAULT_BASELINE})")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed relative regression per metric (0.2 = 20%%)")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--child', nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        path, engine, trips, deductions, repeat = args.child
+        print(json.dumps(run_case(path, engine, int(trips), int(deductions), int(repeat))))
+        return 0
+
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    if args.baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        # Checked up front: a CI job asking for a comparison must not pass
+        # just because the file went missing.
+        parser.error(f"no baseline at {args.baseline}")
+
+    results = {}
+    print(f"{'case':<32} {'wall ms':>9} {'rss KB':>9} {'alloc KB':>9} {'bytes':>10} {'pages':>6}")
+    for trips in [int(n) for n in args.trips.split(',')]:
+        for deductions in [int(n) for n in args.deductions.split(',')]:
+            for engine in args.engines.split(','):
+                for path in args.paths.split(','):
+                    name = case_name(path, engine, trips, deductions)
+                    metrics = spawn_case(path, engine, trips, deductions, args.repeat)
+                    results[name] = metrics
+                    print(f"{name:<32} {metrics['wall_ms']:>9.1f} {metrics['peak_rss_kb']:>9} "
+                          f"{metrics['alloc_peak_kb']:>9} {metrics['bytes']:>10} {metrics['pages']:>6}")
+
+    report = {'environment': environment(), 'threshold': args.threshold, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"no baseline at {baseline_path}; run with --update-baseline to create one")
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline['results'], args.threshold)
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name} {metric}: {before} -> {after} ({(after - before) / before:+.0%})"
+              if before else f"REGRESSION {name} {metric}: {before} -> {after}")
+    if regressions:
+        return 1
+    print(f"no regressions beyond {args.threshold:.0%} against {baseline_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
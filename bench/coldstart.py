@@ -0,0 +1,113 @@
+"""Measure the cold-start cost of the serverless function.
+
+Every run is a fresh interpreter, like a new function instance: it times
+`import api.index`, then serves the sample statement over HTTP from the
+real handler and times the first request and a warm one after it.
+
+    python bench/coldstart.py --runs 10
+    python bench/coldstart.py --runs 10 --engine canvas --modules 15
+
+--modules lists the slowest imports of one run (python -X importtime).
+--json writes the raw samples so cold-start cost can be tracked over time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter. Only the stdlib and the function module
+# are imported before the clock stops; the client side (http.client, the
+# payload) is loaded afterwards so it isn't counted as cold-start cost.
+PROBE = r'''
+import sys, time
+start = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+
+import http.client, json, threading
+from http.server import ThreadingHTTPServer
+from bench.payloads import sample_payload
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), api.index.handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+body = json.dumps(sample_payload())
+timings = []
+conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+for i in range(2):
+    # A distinct truck number each time so the second request isn't a cache hit.
+    payload = json.loads(body)
+    payload['statement_info']['truck_number'] = f"cold-{i}"
+    t = time.perf_counter()
+    conn.request('POST', '/api/index.py?engine=' + sys.argv[1], json.dumps(payload),
+                 {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    timings.append(time.perf_counter() - t)
+    assert response.status == 200, response.status
+server.shutdown()
+print(json.dumps({'import': imported - start, 'first': timings[0], 'warm': timings[1],
+                  'modules': len(sys.modules)}))
+'''
+
+
+def run_probe(engine):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    # A private cache directory would survive between runs; keep it in memory.
+    env.pop('STATEMENT_CACHE_DIR', None)
+    # Nor record the probe's fake trucks in a real ledger.
+    env.pop('STATEMENT_LEDGER_DB', None)
+    out = subprocess.run([sys.executable, '-c', PROBE, engine], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def slowest_imports(count):
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import api.index'],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument('--engine', default='platypus', choices=('platypus', 'canvas'))
+    parser.add_argument('--modules', type=int, default=0, help="list the N slowest imports")
+    parser.add_argument('--json', help="write the samples to this file")
+    args = parser.parse_args(argv)
+
+    # One throwaway run so .pyc files exist and the OS page cache is warm,
+    # as on a function instance started from a deployed bundle.
+    run_probe(args.engine)
+    samples = [run_probe(args.engine) for _ in range(args.runs)]
+
+    print(f"{args.runs} cold starts, engine={args.engine}, {samples[0]['modules']} modules loaded")
+    print(f"{'':>16} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for name, label in (('import', 'import'), ('first', 'first request'), ('warm', 'warm request')):
+        values = [s[name] * 1000 for s in samples]
+        print(f"{label:>16} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+    cold = [(s['import'] + s['first']) * 1000 for s in samples]
+    print(f"{'import + first':>16} {statistics.median(cold):>10.1f} {min(cold):>8.1f} {max(cold):>8.1f}")
+
+    if args.modules:
+        print(f"\nslowest imports (cumulative us, self us):")
+        for cumulative, own, name in slowest_imports(args.modules):
+            print(f"{cumulative:>10} {own:>10}  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'engine': args.engine, 'runs': samples}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
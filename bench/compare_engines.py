@@ -0,0 +1,101 @@
+"""Compare the platypus and direct-canvas engines.
+
+Renders the same payloads with both engines and reports the median render
+time of each, the speedup, and how far the rasterized pages differ. Pages
+are rasterized with pypdfium2 when it is installed (pip install pypdfium2);
+without it only timings and page counts are reported.
+
+    python bench/compare_engines.py --trips 0,3,30,600 --repeat 5
+
+Exits non-zero if any page differs by more than anti-aliasing noise.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.index import PDFGenerator  # noqa: E402
+from bench.payloads import synthetic_payload  # noqa: E402
+
+# Grid lines are drawn as one path by the canvas engine and as separate
+# segments by Table, which shifts anti-aliasing at the joints by up to ~25%
+# intensity. Anything stronger than this is a real difference.
+PIXEL_TOLERANCE = 64
+
+
+def render(payload, engine, layout):
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    PDFGenerator(buffer, layout=layout, engine=engine).generate(payload)
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def rasterize(pdf_bytes, scale):
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    return [pdf[i].render(scale=scale).to_pil().convert('L') for i in range(len(pdf))]
+
+
+def compare_pages(a, b, scale):
+    from PIL import ImageChops
+    pages_a, pages_b = rasterize(a, scale), rasterize(b, scale)
+    if len(pages_a) != len(pages_b):
+        return {'pages': (len(pages_a), len(pages_b)), 'max_diff': 255, 'bad_pixels': None}
+    max_diff = 0
+    bad_pixels = 0
+    for x, y in zip(pages_a, pages_b):
+        histogram = ImageChops.difference(x, y).histogram()
+        max_diff = max([max_diff] + [v for v, n in enumerate(histogram) if n])
+        bad_pixels += sum(histogram[PIXEL_TOLERANCE:])
+    return {'pages': len(pages_a), 'max_diff': max_diff, 'bad_pixels': bad_pixels}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', default='0,3,30,600', help="comma separated trip counts")
+    parser.add_argument('--layout', default='auto', choices=('auto', 'standard', 'long'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.5, help="rasterization scale (1.0 = 72 dpi)")
+    args = parser.parse_args(argv)
+
+    try:
+        import pypdfium2  # noqa: F401
+        visual = True
+    except ImportError:
+        visual = False
+        print("pypdfium2 not installed: skipping the visual comparison")
+
+    failed = False
+    print(f"{'trips':>6} {'pages':>5} {'platypus ms':>12} {'canvas ms':>10} {'speedup':>8} {'max diff':>9} {'bad px':>7}")
+    for trips in [int(n) for n in args.trips.split(',')]:
+        payload = synthetic_payload(trips)
+        # One warm-up render each so process-wide caches don't skew the first.
+        render(payload, 'platypus', args.layout)
+        render(payload, 'canvas', args.layout)
+        times = {'platypus': [], 'canvas': []}
+        for _ in range(args.repeat):
+            for engine in times:
+                pdf, elapsed = render(payload, engine, args.layout)
+                times[engine].append(elapsed)
+        platypus_pdf, _ = render(payload, 'platypus', args.layout)
+        canvas_pdf, _ = render(payload, 'canvas', args.layout)
+        platypus_ms = statistics.median(times['platypus']) * 1000
+        canvas_ms = statistics.median(times['canvas']) * 1000
+
+        pages, max_diff, bad = '-', '-', '-'
+        if visual:
+            result = compare_pages(platypus_pdf, canvas_pdf, args.scale)
+            pages, max_diff, bad = result['pages'], result['max_diff'], result['bad_pixels']
+            if bad is None or bad > 0:
+                failed = True
+        print(f"{trips:>6} {pages!s:>5} {platypus_ms:>12.1f} {canvas_ms:>10.1f} "
+              f"{platypus_ms / canvas_ms:>7.2f}x {max_diff!s:>9} {bad!s:>7}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
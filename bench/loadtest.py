@@ -0,0 +1,390 @@
+"""Load-test the statement API on a local stand-in deployment.
+
+Starts the real handler (api/index.py) in a separate process on an
+ephemeral port, as a single function instance would run it, or the
+pre-forked server (api/server.py) with --workers. Then fires a mix of
+statement sizes at it, one step per concurrency level and arrival rate:
+
+    python bench/loadtest.py --concurrency 1,4,16 --duration 20
+    python bench/loadtest.py --mix 3:90,2000:10 --concurrency 8 --rate 5,10,20
+    python bench/loadtest.py --workers 4 --query engine=canvas --json canvas.json
+
+--mix is trips:weight pairs. Without --rate every client sends its next
+request as soon as the last one is answered (closed loop); with it,
+requests arrive at that rate (Poisson, or evenly spaced with --arrival
+uniform) and wait for a free client, and latency is counted from the
+arrival, so queueing shows up in the percentiles; arrivals no client
+picked up within --drain after the step count as errors. Each request has
+its own truck number so none is answered from the response cache
+(--cached sends the same statements again and again instead).
+
+The server never sees STATEMENT_CACHE_DIR or STATEMENT_LEDGER_DB from the
+environment, so a run neither fills the real disk cache nor records its
+fake trucks in the real ledger. --ledger records them in a temporary
+ledger instead, to include its cost in the timings.
+
+For every step it reports throughput, p50/p95/p99 latency, the error rate
+and the server's peak RSS (all processes); the RSS is also sampled over
+time. --json writes all of it, with the options and git revision, for
+comparing releases and rendering configurations. The server's own log is
+discarded unless --server-log is given.
+
+Exits non-zero if any request failed.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import queue
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.payloads import ROOT, synthetic_payload  # noqa: E402
+
+# The stand-in deployment: the handler on a threading server, in its own
+# process so its RSS is its own and the client doesn't share its GIL.
+SERVER = r'''
+from http.server import ThreadingHTTPServer
+from api.index import handler
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+server = Server(('127.0.0.1', 0), handler)
+print(f"serving on http://127.0.0.1:{server.server_address[1]}", flush=True)
+server.serve_forever()
+'''
+SERVING = re.compile(r'serving on http://[^\s:]+:(\d+)')
+
+TRUCK = '@LOADTEST-TRUCK@'
+
+
+class Server:
+    def __init__(self, workers=0, connections=8, log=None, ledger=None):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        env.pop('STATEMENT_CACHE_DIR', None)
+        env.pop('STATEMENT_LEDGER_DB', None)
+        if ledger:
+            env['STATEMENT_LEDGER_DB'] = ledger
+        if workers:
+            command = [sys.executable, '-m', 'api.server', '--host', '127.0.0.1', '--port', '0',
+                       '--workers', str(workers), '--connections', str(connections), '--job-workers', '0']
+        else:
+            command = [sys.executable, '-c', SERVER]
+        # The server's request and statement logs go to `log` (a file) or nowhere.
+        self.process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+                                        stderr=log if log is not None else subprocess.DEVNULL)
+        line = self.process.stdout.readline()
+        match = SERVING.search(line)
+        if not match:
+            self.stop()
+            raise RuntimeError(f"server did not start: {line!r}")
+        self.port = int(match.group(1))
+        # Keep reading so a chatty server never blocks on a full pipe.
+        threading.Thread(target=self.process.stdout.read, daemon=True).start()
+
+    def rss(self):
+        # Resident memory of the server and its children in bytes, from
+        # /proc (Linux); None elsewhere.
+        if not os.path.isdir(f'/proc/{self.process.pid}'):
+            return None
+        total, pids = 0, [self.process.pid]
+        while pids:
+            pid = pids.pop()
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+                for task in os.listdir(f'/proc/{pid}/task'):
+                    with open(f'/proc/{pid}/task/{task}/children') as f:
+                        pids.extend(int(child) for child in f.read().split())
+            except FileNotFoundError:
+                # A worker that exited between the listing and the read.
+                continue
+            except OSError:
+                return None
+        return total
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=35)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def parse_mix(text):
+    mix = []
+    for part in text.split(','):
+        trips, _, weight = part.partition(':')
+        mix.append((int(trips), float(weight or 1)))
+    return mix
+
+
+class Payloads:
+    # Request bodies for each size of the mix, serialized once; only the
+    # truck number is substituted per request.
+    def __init__(self, mix, deductions, cached):
+        self.sizes = [trips for trips, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.bodies = {trips: json.dumps(synthetic_payload(trips, deductions, TRUCK)).encode()
+                       for trips in self.sizes}
+        self.cached = cached
+        self.counter = itertools.count()
+
+    def pick(self, rng):
+        trips = rng.choices(self.sizes, self.weights)[0]
+        body = self.bodies[trips]
+        if not self.cached:
+            body = body.replace(TRUCK.encode(), f"lt-{next(self.counter)}".encode())
+        return trips, body
+
+
+def percentile(values, fraction):
+    # Nearest rank on sorted values.
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+class Step:
+    # One concurrency level / arrival rate. Results are appended by the
+    # client threads; list.append is atomic.
+    def __init__(self, name, concurrency, rate):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.results = []
+        self.unsent = 0
+        self.started = self.finished = None
+
+    def summary(self, rss):
+        ok = sorted(r['latency'] for r in self.results if r['ok'])
+        service = sorted(r['service'] for r in self.results if r['ok'])
+        errors = {}
+        for r in self.results:
+            if not r['ok']:
+                errors[r['error']] = errors.get(r['error'], 0) + 1
+        elapsed = (self.finished - self.started) if self.results else 0
+        attempted = len(self.results) + self.unsent
+        return {
+            'name': self.name,
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'requests': len(self.results),
+            'unsent': self.unsent,
+            'ok': len(ok),
+            'errors': errors,
+            'error_rate': (attempted - len(ok)) / attempted if attempted else 0.0,
+            'seconds': elapsed,
+            'throughput': len(ok) / elapsed if elapsed else 0.0,
+            'trips_per_second': sum(r['trips'] for r in self.results if r['ok']) / elapsed if elapsed else 0.0,
+            'latency_ms': {name: percentile(ok, q) * 1000 if ok else None
+                           for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+            'service_ms': {name: percentile(service, q) * 1000 if service else None
+                           for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+            'peak_rss': max(rss, default=None),
+        }
+
+
+def send(connection, path, body):
+    # Returns (status, error); reconnects after any failure.
+    try:
+        connection.request('POST', path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status, None if response.status == 200 else f"HTTP {response.status}"
+    except (OSError, http.client.HTTPException) as e:
+        connection.close()
+        return None, type(e).__name__
+
+
+def run_step(step, server, payloads, args):
+    path = args.path + (f"?{args.query}" if args.query else '')
+    deadline = time.perf_counter() + args.duration
+    arrivals = queue.Queue() if step.rate else None
+
+    def client(index):
+        rng = random.Random(f"{args.seed}:{step.name}:{index}")
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=args.timeout)
+        while True:
+            if arrivals is None:
+                if time.perf_counter() >= deadline:
+                    break
+                arrived = time.perf_counter()
+            else:
+                arrived = arrivals.get()
+                if arrived is None:
+                    break
+            trips, body = payloads.pick(rng)
+            sent = time.perf_counter()
+            _, error = send(connection, path, body)
+            done = time.perf_counter()
+            step.results.append({'trips': trips, 'ok': error is None, 'error': error,
+                                 'latency': done - arrived, 'service': done - sent, 'done': done})
+        connection.close()
+
+    step.started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(step.concurrency)]
+    for thread in clients:
+        thread.start()
+    if arrivals is not None:
+        rng = random.Random(f"{args.seed}:{step.name}:arrivals")
+        at = step.started
+        while True:
+            at += rng.expovariate(step.rate) if args.arrival == 'poisson' else 1 / step.rate
+            if at >= deadline:
+                break
+            time.sleep(max(0.0, at - time.perf_counter()))
+            arrivals.put(at)
+        # Arrivals still waiting for a client after --drain are not sent.
+        drain_until = time.perf_counter() + args.drain
+        while arrivals.qsize() and time.perf_counter() < drain_until:
+            time.sleep(0.05)
+        while True:
+            try:
+                arrivals.get_nowait()
+                step.unsent += 1
+            except queue.Empty:
+                break
+        for _ in clients:
+            arrivals.put(None)
+    for thread in clients:
+        thread.join(args.timeout + args.drain)
+    step.finished = max((r['done'] for r in step.results), default=time.perf_counter())
+
+
+def sample_rss(server, samples, state, interval, stop):
+    start = time.perf_counter()
+    while not stop.wait(interval):
+        step = state.get('step')
+        samples.append({'t': round(time.perf_counter() - start, 3), 'step': step.name if step else None,
+                        'rss': server.rss(), 'completed': len(step.results) if step else 0})
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def megabytes(value):
+    return f"{value / 2**20:.0f}" if value is not None else '-'
+
+
+def milliseconds(value):
+    return f"{value:.0f}" if value is not None else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', default='3:80,100:15,2000:5', help="trips:weight pairs")
+    parser.add_argument('--deductions', type=int, default=1)
+    parser.add_argument('--concurrency', default='1,4,8', help="comma separated client counts")
+    parser.add_argument('--rate', default='', help="comma separated arrival rates (requests/s); closed loop if empty")
+    parser.add_argument('--arrival', choices=('poisson', 'uniform'), default='poisson')
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of arrivals per step")
+    parser.add_argument('--drain', type=float, default=30.0, help="seconds to let queued arrivals finish")
+    parser.add_argument('--timeout', type=float, default=120.0, help="per request, in seconds")
+    parser.add_argument('--path', default='/api/index.py')
+    parser.add_argument('--query', default='', help="rendering options, e.g. engine=canvas&output=compact")
+    parser.add_argument('--workers', type=int, default=0, help="serve with api/server.py and this many workers")
+    parser.add_argument('--connections', type=int, default=8, help="connections per api/server.py worker")
+    parser.add_argument('--cached', action='store_true', help="repeat the same statements (cache hits)")
+    parser.add_argument('--ledger', action='store_true', help="record statements in a temporary ledger")
+    parser.add_argument('--warmup', type=int, default=2, help="unrecorded requests per payload size first")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="seconds between RSS samples")
+    parser.add_argument('--server-log', help="append the server's log to this file")
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--json', help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    payloads = Payloads(mix, args.deductions, args.cached)
+    rates = [float(rate) for rate in args.rate.split(',') if rate] or [None]
+    steps = [Step(f"c{concurrency}" + (f"-r{rate:g}" if rate else ''), concurrency, rate)
+             for concurrency in [int(c) for c in args.concurrency.split(',')] for rate in rates]
+
+    log = open(args.server_log, 'a') if args.server_log else None
+    scratch = tempfile.TemporaryDirectory(prefix='loadtest-') if args.ledger else None
+    ledger = os.path.join(scratch.name, 'ledger.sqlite3') if scratch else None
+    server = Server(args.workers, args.connections, log, ledger)
+    samples, state, stop = [], {}, threading.Event()
+    sampler = threading.Thread(target=sample_rss, args=(server, samples, state, args.sample_interval, stop),
+                               daemon=True)
+    try:
+        warmup = http.client.HTTPConnection('127.0.0.1', server.port, timeout=args.timeout)
+        rng = random.Random(args.seed)
+        for trips in payloads.sizes:
+            for _ in range(args.warmup):
+                body = payloads.bodies[trips].replace(TRUCK.encode(), f"warmup-{rng.random()}".encode())
+                send(warmup, args.path + (f"?{args.query}" if args.query else ''), body)
+        warmup.close()
+        idle_rss = server.rss()
+
+        sampler.start()
+        print(f"{'step':<12} {'reqs':>6} {'ok/s':>7} {'trips/s':>8} {'err %':>6} {'p50 ms':>7} "
+              f"{'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'rss MB':>7}")
+        summaries = []
+        for step in steps:
+            state['step'] = step
+            first_sample = len(samples)
+            run_step(step, server, payloads, args)
+            rss = [s['rss'] for s in samples[first_sample:] if s['rss'] is not None]
+            summary = step.summary(rss + [r for r in [server.rss()] if r is not None])
+            summaries.append(summary)
+            latency = summary['latency_ms']
+            print(f"{step.name:<12} {summary['requests']:>6} {summary['throughput']:>7.2f} "
+                  f"{summary['trips_per_second']:>8.0f} {summary['error_rate'] * 100:>6.1f} "
+                  f"{milliseconds(latency['p50']):>7} {milliseconds(latency['p95']):>7} "
+                  f"{milliseconds(latency['p99']):>7} {milliseconds(latency['max']):>7} "
+                  f"{megabytes(summary['peak_rss']):>7}")
+            for error, count in sorted(summary['errors'].items()):
+                print(f"  {count} x {error}")
+            if summary['unsent']:
+                print(f"  {summary['unsent']} arrivals not sent within --drain")
+    finally:
+        stop.set()
+        server.stop()
+        if log is not None:
+            log.close()
+        if scratch is not None:
+            scratch.cleanup()
+
+    print(f"server RSS: {megabytes(idle_rss)} MB after warm-up, "
+          f"{megabytes(max((s['rss'] for s in samples if s['rss']), default=None))} MB peak")
+    if args.json:
+        report = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'options': {'mix': mix, 'deductions': args.deductions, 'query': args.query, 'path': args.path,
+                        'workers': args.workers, 'connections': args.connections, 'arrival': args.arrival,
+                        'duration': args.duration, 'cached': args.cached,
+                        'ledger': args.ledger},
+            'idle_rss': idle_rss,
+            'steps': summaries,
+            'rss_samples': samples,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(summary['error_rate'] for summary in summaries) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# Synthetic statement payloads shaped like python_backup/data.json, for the
+# scripts in this directory. Deterministic for a given size.
+import copy
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PATH = os.path.join(ROOT, 'python_backup', 'data.json')
+
+ROUTES = [
+    "Salem, MA-Murfreesboro, TN",
+    "Murfreesboro, TN-Knoxville, TN",
+    "Morristown, TN-Salem, OR",
+    "Chicago, IL-Dallas, TX",
+    "Atlanta, GA-Orlando, FL",
+]
+
+
+def sample_payload():
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+def synthetic_payload(trips, deductions=1, truck_number="196"):
+    data = copy.deepcopy(sample_payload())
+    data['statement_info']['truck_number'] = truck_number
+    # Fixed week period so renders (and cache keys) don't depend on the day.
+    data['statement_info']['week_period'] = "12.01-12.07"
+    data['trips'] = []
+    for i in range(trips):
+        quantity = 1000 + (i * 137) % 5000
+        data['trips'].append({
+            "date": f"12/{i % 28 + 1:02d}/25",
+            "trip_number": f"{1743657425 + i}.\n00",
+            "route": ROUTES[i % len(ROUTES)],
+            "description": f"30% of ${quantity:,.2f}",
+            "quantity": quantity,
+            "rate": 0.3,
+            "amount": round(quantity * 0.3, 2),
+        })
+    data['deductions'] = [
+        {"description": "OCCUPATIONAL ACCIDENTAL INSURANCE", "date": f"12/{i % 28 + 1:02d}/25", "amount": -37.5}
+        for i in range(deductions)
+    ]
+    return data
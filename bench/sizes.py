@@ -0,0 +1,98 @@
+"""Compare statement sizes of the standard and compact output profiles.
+
+Renders the benchmark payloads (bench/payloads.py) with ?output=standard and
+?output=compact and reports the size of each, and checks that every font in
+both is one of the standard 14, referenced by name and not embedded. With
+pypdfium2 installed the two are also rasterized and compared, as in
+bench/compare_engines.py (the compact logo is resampled, so small
+differences there are expected).
+
+    python bench/sizes.py --trips 1,10,100,1000 --engines platypus,canvas
+    python bench/sizes.py --json sizes.json
+
+Exits non-zero if a font is embedded or not a standard one.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab import rl_config  # noqa: E402
+from reportlab.pdfbase.pdfmetrics import standardFonts  # noqa: E402
+
+from api.index import PDFGenerator  # noqa: E402
+from bench.payloads import synthetic_payload  # noqa: E402
+
+BASE_FONT = re.compile(rb'/BaseFont /([^\s/>\]]+)')
+EMBEDDED_FONT = re.compile(rb'/FontFile[23]?\b')
+
+
+def render(payload, engine, output):
+    buffer = io.BytesIO()
+    PDFGenerator(buffer, engine=engine, output=output).generate(payload)
+    return buffer.getvalue()
+
+
+def font_problems(pdf):
+    # Embedded font programs, or fonts a viewer doesn't already have.
+    problems = []
+    if EMBEDDED_FONT.search(pdf):
+        problems.append("embedded font program")
+    for name in sorted(set(BASE_FONT.findall(pdf))):
+        if name.decode('latin-1') not in standardFonts:
+            problems.append(f"non-standard font {name.decode('latin-1')}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', default='1,10,100,1000', help="comma separated trip counts")
+    parser.add_argument('--deductions', type=int, default=1)
+    parser.add_argument('--engines', default='platypus', help="platypus, canvas or both")
+    parser.add_argument('--scale', type=float, default=1.5, help="rasterization scale (1.0 = 72 dpi)")
+    parser.add_argument('--json', help="write the sizes to this file")
+    args = parser.parse_args(argv)
+
+    # Fixed document ID and creation date, so sizes are comparable.
+    rl_config.invariant = 1
+    try:
+        from bench.compare_engines import compare_pages
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        compare_pages = None
+        print("pypdfium2 not installed: skipping the visual comparison")
+
+    failed = False
+    results = {}
+    print(f"{'case':<18} {'pages':>5} {'standard':>10} {'compact':>10} {'saved':>7} {'max diff':>9} {'fonts':>6}")
+    for trips in [int(n) for n in args.trips.split(',')]:
+        payload = synthetic_payload(trips, args.deductions)
+        for engine in args.engines.split(','):
+            standard = render(payload, engine, 'standard')
+            compact = render(payload, engine, 'compact')
+            problems = font_problems(standard) + font_problems(compact)
+            failed = failed or bool(problems)
+            pages, max_diff = '-', '-'
+            if compare_pages is not None:
+                result = compare_pages(standard, compact, args.scale)
+                pages, max_diff = result['pages'], result['max_diff']
+            name = f"{engine}/{trips}t"
+            results[name] = {'standard': len(standard), 'compact': len(compact), 'font_problems': problems}
+            saved = 1 - len(compact) / len(standard)
+            print(f"{name:<18} {pages!s:>5} {len(standard):>10} {len(compact):>10} {saved:>7.1%} "
+                  f"{max_diff!s:>9} {'ok' if not problems else 'FAIL':>6}")
+            for problem in problems:
+                print(f"  {problem}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,245 +1,257 @@
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
+# Offline statement rendering with the same generator as the API
+# (api/index.py), for regenerating statements in bulk.
+#
+#   python python_backup/generate_statement.py statements/ --out-dir pdfs/
+#   python python_backup/generate_statement.py 'statements/2025-*/*.json' --jobs 8
+#   python python_backup/generate_statement.py statements/ --out-dir pdfs/ --dry-run
+#
+# Every input is a JSON file holding one statement payload, as POSTed to
+# /api/index.py; directories are searched for *.json. Each PDF is written
+# under --out-dir at the input's path relative to the directory or glob it
+# was found by (next to the input without --out-dir), on a pool of --jobs
+# worker processes (default: the usable cores, or $STATEMENT_WORKERS).
+#
+# A manifest (statements-manifest.json in the output directory) remembers
+# the SHA-256 of each input, the template fingerprint (layout version and
+# logo, see api/resources.py) and the rendering options it was rendered
+# with. An input is skipped when all three match and its PDF is still there,
+# so a nightly run only renders what changed; --force renders everything.
+# YTD figures are the ones in each file: the statement ledger
+# (api/ledger.py) is neither read nor written, even with STATEMENT_LEDGER_DB
+# set, so a skipped input can't have gone stale through it.
+#
+# Without arguments, renders ./data.json to ./statement.pdf as this script
+# always has.
+import argparse
+import glob
+import hashlib
+import io
+import json
 import os
-from datetime import datetime
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import json
-import locale
-
-# Set locale for currency formatting
-try:
-    locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-except locale.Error:
-    locale.setlocale(locale.LC_ALL, '')
-
-class PDFGenerator:
-    def __init__(self, filename="statement.pdf"):
-        self.filename = filename
-        self.styles = getSampleStyleSheet()
-        self.width, self.height = letter
-
-    def format_currency(self, amount):
-        if amount < 0:
-            return f"({locale.currency(abs(amount), grouping=True)})"
-        return locale.currency(amount, grouping=True)
-
-    def _header_footer(self, canvas, doc):
-        # Save canvas state
-        canvas.saveState()
-        
-        # Header content
-        # Logo placeholder (Top Left)
-        # Assuming logo is approx 2 inch wide
-        logo_path = "logo.png"  # User needs to provide this
-        if os.path.exists(logo_path):
-            try:
-                canvas.drawImage(logo_path, 30, self.height - 100, width=2*inch, preserveAspectRatio=True, mask='auto')
-            except Exception:
-                pass
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api.batch import pool_size  # noqa: E402
+from api.compact import OUTPUTS  # noqa: E402
+from api.index import ENGINES, LAYOUTS, PDFGenerator  # noqa: E402
+from api.resources import get_resources  # noqa: E402
+
+MANIFEST_NAME = 'statements-manifest.json'
+MANIFEST_VERSION = 1
+# Rendered when there are no arguments and no ./data.json.
+EMPTY_STATEMENT = b'{"trips": [], "deductions": [], "ytd": {"net": 0, "gross": 0}}'
+
+
+def find_inputs(inputs):
+    # Yields (path, relative path) for every statement file named by
+    # `inputs`: files, directories (searched recursively) and glob patterns.
+    # The relative path is where the PDF goes under --out-dir.
+    seen = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(directory, name)
+                       for directory, _, files in os.walk(pattern) for name in files
+                       if name.endswith('.json') and name != MANIFEST_NAME]
+            base = pattern
+        elif glob.has_magic(pattern):
+            matches = [path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)]
+            base = _glob_base(pattern)
         else:
-            # Draw placeholder
-            canvas.setStrokeColor(colors.black)
-            canvas.rect(30, self.height - 100, 2*inch, 0.8*inch)
-            canvas.setFont("Helvetica", 10)
-            canvas.drawString(40, self.height - 60, "SPF Transportation LLC (Logo)")
-
-        # Company Address (Below Logo)
-        canvas.setFont("Helvetica", 8)
-        canvas.drawString(30, self.height - 120, "8046 S Carnaby CT Hanover Park, IL 60133")
-        canvas.drawString(30, self.height - 130, "Phone #: (312)690-3717")
-
-        # Statement Info (Top Right)
-        # Use data if available attached to doc, else default
-        statement_data = getattr(doc, 'statement_data', {})
-        date_str = statement_data.get('date', "12/12/2025")
-        truck_num = statement_data.get('truck_number', "196")
-
-        canvas.setFont("Helvetica-Bold", 12)
-        canvas.drawRightString(self.width - 30, self.height - 50, "Statement")
-        canvas.setFont("Helvetica", 12)
-        canvas.drawRightString(self.width - 30, self.height - 65, "FITRIGHT LOGISTICS LLC")
-        canvas.drawRightString(self.width - 30, self.height - 80, f"Date: {date_str}")
-        canvas.drawRightString(self.width - 30, self.height - 95, f"Truck # {truck_num}")
-
-        # Footer
-        canvas.setFont("Helvetica", 8)
-        canvas.drawString(30, 30, "SPF Transportation LLC")
-        canvas.drawString(30, 20, datetime.now().strftime("%12/%11/%25 %H:%M")) # Example format
-        
-        canvas.drawCentredString(self.width / 2, 30, "ProTransport Trucking Software")
-        canvas.drawCentredString(self.width / 2, 20, "www.pro-transport.com")
-        
-        canvas.drawRightString(self.width - 30, 20, f"Page {doc.page} Of 1") # Assuming 1 page for now
-
-        canvas.restoreState()
-
-    def generate(self, data):
-        doc = SimpleDocTemplate(self.filename, pagesize=letter,
-                                rightMargin=30, leftMargin=30,
-                                topMargin=150, bottomMargin=50)
-        
-        # Pass statement info to doc for header
-        doc.statement_data = data.get('statement_info', {})
-
-        elements = []
-        
-        # Styles
-        normal_style = self.styles["Normal"]
-        bold_style = ParagraphStyle('Bold', parent=normal_style, fontName='Helvetica-Bold', fontSize=10)
-        
-        # Recipient Info
-        recipient = data.get('recipient', {})
-        elements.append(Paragraph(f"<b>{recipient.get('name', '')}</b>", normal_style))
-        elements.append(Paragraph(f"<b>{recipient.get('address_line_1', '')}</b>", normal_style))
-        elements.append(Paragraph(f"<b>{recipient.get('address_line_2', '')}</b>", normal_style))
-        elements.append(Spacer(1, 20))
-
-        # Trips Section
-        elements.append(Paragraph("<b>Trips :</b>", bold_style))
-        elements.append(Spacer(1, 5))
-        
-        trip_headers = ["Date", "Trip #", "Route", "Description", "Quantity", "Rate", "Amount"]
-        
-        # Process Trips Data
-        processed_trips = [trip_headers]
-        total_trips_amount = 0.0
-        
-        for trip in data.get('trips', []):
-            amount = float(trip.get('amount', 0))
-            total_trips_amount += amount
-            processed_trips.append([
-                trip.get('date', ''),
-                trip.get('trip_number', ''),
-                trip.get('route', ''),
-                trip.get('description', ''),
-                f"{float(trip.get('quantity', 0)):.2f}",
-                f"{float(trip.get('rate', 0)):.4f}",
-                self.format_currency(amount)
-            ])
-
-        col_widths = [50, 60, 150, 120, 50, 50, 60]
-        
-        t_trips = Table(processed_trips, colWidths=col_widths)
-        t_trips.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (3, -1), 'LEFT'), # Align Route and Description Left
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        elements.append(t_trips)
-        
-        # Trips Total
-        t_trip_total = Table([["Total:", self.format_currency(total_trips_amount)]], colWidths=[sum(col_widths)-70, 70])
-        t_trip_total.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'), # Amount center or right
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
-            ('GRID', (1, 0), (1, 0), 0.5, colors.black), # Box around amount
-        ]))
-        elements.append(t_trip_total)
-        elements.append(Spacer(1, 10))
-
-        # Scheduled Deductions Section
-        elements.append(Paragraph("<b>Scheduled Deductions :</b>", bold_style))
-        elements.append(Spacer(1, 5))
-        
-        deduction_headers = ["Description", "Date", "Amount"]
-        processed_deductions = [deduction_headers]
-        total_deductions_amount = 0.0
-        
-        for ded in data.get('deductions', []):
-            amount = float(ded.get('amount', 0))
-            total_deductions_amount += amount
-            processed_deductions.append([
-                ded.get('description', ''),
-                ded.get('date', ''),
-                self.format_currency(amount)
-            ])
-        
-        # Deductions width
-        ded_col_widths = [sum(col_widths)-110, 50, 60]
-        
-        t_deductions = Table(processed_deductions, colWidths=ded_col_widths)
-        t_deductions.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
-        elements.append(t_deductions)
-        
-        # Deductions Total
-        t_ded_total = Table([["Total:", self.format_currency(total_deductions_amount)]], colWidths=[sum(ded_col_widths)-70, 70])
-        t_ded_total.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
-            ('GRID', (1, 0), (1, 0), 0.5, colors.black),
-        ]))
-        elements.append(t_ded_total)
-        elements.append(Spacer(1, 20))
-
-        # Summary Section
-        ytd_net = data.get('ytd', {}).get('net', 0.0)
-        ytd_gross = data.get('ytd', {}).get('gross', 0.0)
-        check_amount = total_trips_amount + total_deductions_amount
-
-        t_summary = Table([
-            [f"Total Net Year-To-Date : ", self.format_currency(ytd_net), "", ""],
-            [f"Total Gross Year-To-Date : ", self.format_currency(ytd_gross), "Check Amount:", self.format_currency(check_amount)]
-        ], colWidths=[150, 100, sum(col_widths)-150-100-70, 70])
-        
-        t_summary.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TEXTCOLOR', (1, 0), (1, 1), colors.blue), # YTD Values Blue
-            ('TEXTCOLOR', (3, 1), (3, 1), colors.red), # Check Amount Red
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'), # Label Right aligned
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'), # Value Left aligned
-            ('ALIGN', (2, 1), (2, 1), 'RIGHT'), # "Check Amount:"
-            ('ALIGN', (3, 1), (3, 1), 'CENTER'), # Amount
-            ('GRID', (3, 1), (3, 1), 0.5, colors.black), # Box around check amount
-        ]))
-        
-        elements.append(t_summary)
-        
-        # Add date range at bottom left if needed
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("12.01-12.07", normal_style))
-
-        # Build PDF
-        doc.build(elements, onFirstPage=self._header_footer, onLaterPages=self._header_footer)
+            matches = [pattern]
+            base = os.path.dirname(pattern)
+        for path in sorted(matches):
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                yield path, os.path.relpath(path, base or '.')
+
+
+def _glob_base(pattern):
+    # The directories of a glob pattern before its first wildcard.
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts)
+
+
+def target_for(path, relative, out_dir):
+    name = os.path.splitext(relative if out_dir else path)[0] + '.pdf'
+    return os.path.join(out_dir, name) if out_dir else name
+
+
+def render_key(options):
+    # What besides the input decides the PDF: the template and the options.
+    fingerprint = get_resources().fingerprint
+    return ':'.join([fingerprint] + [f"{name}={options[name]}" for name in sorted(options)])
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"ignoring unreadable manifest {path}")
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('statements', {})
+
+
+def save_manifest(path, statements):
+    write_file(path, json.dumps({'version': MANIFEST_VERSION, 'statements': statements},
+                                indent=1, sort_keys=True).encode())
+
+
+def write_file(path, data):
+    # Written next to the target and renamed over it, so an interrupted run
+    # never leaves a truncated PDF (or manifest) behind.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def render_file(data, target, options):
+    # Runs in a worker process. Renders the statement JSON in `data` (the
+    # bytes that were hashed, not a second read of the file) to `target`.
+    # Returns (ok, pdf size or error, trips, seconds).
+    start = time.perf_counter()
+    try:
+        payload = json.loads(data)
+        if not isinstance(payload, dict):
+            raise ValueError("statement payload must be a JSON object")
+        buffer = io.BytesIO()
+        # No ledger: regenerating old statements mustn't record them again or
+        # take their YTD from it (see the header).
+        PDFGenerator(buffer, ledger=None, **options).generate(payload)
+        pdf = buffer.getbuffer()
+        write_file(target, pdf)
+        return True, len(pdf), len(payload.get('trips', [])), time.perf_counter() - start
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}", 0, time.perf_counter() - start
+
+
+def plan(inputs, out_dir, manifest, manifest_dir, key, force):
+    # (path, target, manifest name, data, digest, reason) for each input that
+    # needs rendering, and the number that don't.
+    todo, skipped = [], 0
+    for path, relative in find_inputs(inputs):
+        target = target_for(path, relative, out_dir)
+        name = os.path.relpath(target, manifest_dir)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = manifest.get(name)
+        if force:
+            reason = 'forced'
+        elif entry is None:
+            reason = 'new'
+        elif entry.get('sha256') != digest:
+            reason = 'input changed'
+        elif entry.get('key') != key:
+            reason = 'template or options changed'
+        elif not os.path.exists(target) or os.path.getsize(target) != entry.get('bytes'):
+            reason = 'PDF missing'
+        else:
+            skipped += 1
+            continue
+        todo.append((path, target, name, data, digest, reason))
+    return todo, skipped
+
+
+def run(todo, options, workers):
+    # Yields (item, result) as statements finish.
+    if workers <= 1:
+        for item in todo:
+            yield item, render_file(item[3], item[1], options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_file, item[3], item[1], options): item for item in todo}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render statement JSON files to PDF, skipping unchanged ones.")
+    parser.add_argument('inputs', nargs='*', help="statement JSON files, directories or glob patterns")
+    parser.add_argument('--out-dir', help="write PDFs here (default: next to each input)")
+    parser.add_argument('--manifest', help=f"manifest file (default: {MANIFEST_NAME} in the output directory)")
+    parser.add_argument('--jobs', '-j', type=int, default=pool_size(), help="worker processes")
+    parser.add_argument('--force', action='store_true', help="render every input, changed or not")
+    parser.add_argument('--dry-run', action='store_true', help="list what would be rendered and why")
+    parser.add_argument('--layout', choices=LAYOUTS, default='auto')
+    parser.add_argument('--engine', choices=ENGINES, default='platypus')
+    parser.add_argument('--output', choices=OUTPUTS, default='standard', help="output profile")
+    parser.add_argument('--verbose', '-v', action='store_true', help="print every rendered statement")
+    args = parser.parse_args(argv)
+    options = {'layout': args.layout, 'engine': args.engine, 'output': args.output}
+
+    if not args.inputs:
+        data = EMPTY_STATEMENT
+        if os.path.exists('data.json'):
+            with open('data.json', 'rb') as f:
+                data = f.read()
+        ok, result, _, _ = render_file(data, 'statement.pdf', options)
+        if not ok:
+            print(f"data.json: {result}")
+            return 1
+        print("PDF Generated: statement.pdf")
+        return 0
+
+    manifest_path = args.manifest or os.path.join(args.out_dir or '.', MANIFEST_NAME)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    manifest = load_manifest(manifest_path)
+    key = render_key(options)
+
+    todo, skipped = plan(args.inputs, args.out_dir, manifest, manifest_dir, key, args.force)
+    if args.dry_run:
+        for path, target, _, _, _, reason in todo:
+            print(f"would render {path} -> {target} ({reason})")
+        print(f"{len(todo)} to render, {skipped} unchanged")
+        return 0
+
+    workers = max(1, min(args.jobs, len(todo)))
+    start = time.perf_counter()
+    rendered = failed = trips = written = 0
+    busy = 0.0
+    try:
+        for (path, target, name, _, digest, _), (ok, result, count, seconds) in run(todo, options, workers):
+            busy += seconds
+            if not ok:
+                failed += 1
+                manifest.pop(name, None)
+                print(f"failed {path}: {result}")
+                continue
+            rendered += 1
+            trips += count
+            written += result
+            manifest[name] = {'input': os.path.relpath(path, manifest_dir), 'sha256': digest,
+                              'key': key, 'bytes': result}
+            if args.verbose:
+                print(f"rendered {path} -> {target} ({result} bytes, {seconds * 1000:.0f} ms)")
+    finally:
+        # Saved after an interrupt too, so the next run keeps what finished.
+        save_manifest(manifest_path, manifest)
+    elapsed = time.perf_counter() - start
+
+    print(f"{rendered} rendered, {skipped} unchanged, {failed} failed in {elapsed:.2f} s "
+          f"on {workers} worker{'s' if workers > 1 else ''}")
+    if rendered:
+        print(f"  {rendered / elapsed:.1f} statements/s, {trips / elapsed:.0f} trips/s, "
+              f"{written / elapsed / 1e6:.1f} MB/s written, {busy / rendered * 1000:.0f} ms per statement")
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    # Load data from json file if exists, else use mock
-    data_file = "data.json"
-    if os.path.exists(data_file):
-        with open(data_file, 'r') as f:
-            data = json.load(f)
-    else:
-        # Fallback Mock Data
-        data = {
-            "trips": [],
-            "deductions": [],
-            "ytd": {"net": 0, "gross": 0}
-        }
-    
-    gen = PDFGenerator("statement.pdf")
-    gen.generate(data)
-    print("PDF Generated: statement.pdf")
+    sys.exit(main())
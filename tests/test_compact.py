@@ -0,0 +1,48 @@
+import unittest
+
+from api.compact import compact_operators
+
+
+class CompactOperatorsTest(unittest.TestCase):
+    def test_repeated_state_is_dropped(self):
+        code = ['0 0 0 RG', '1 w', '0 0 0 RG', '1 w', '.5 w', '1 w', '1 0 0 1 0 0 cm']
+        self.assertEqual(compact_operators(code), ['0 0 0 RG', '1 w', '.5 w', '1 w'])
+
+    def test_state_restored_after_Q(self):
+        # Inside q..Q the line width changes; after Q the outer width is in
+        # effect again, so setting it to its old value is dropped but setting
+        # it to the inner value is kept.
+        code = ['1 w', 'q', '1 w', '2 w', '2 w', 'Q', '1 w', '2 w']
+        self.assertEqual(compact_operators(code), ['1 w', 'q', '2 w', 'Q', '2 w'])
+
+    def test_unbalanced_Q_forgets_state(self):
+        self.assertEqual(compact_operators(['1 w', 'Q', '1 w']), ['1 w', 'Q', '1 w'])
+
+    def test_colour_inside_text_clears_state(self):
+        # The fill colour set inside BT..ET stays in effect after ET.
+        code = ['0 0 0 rg', 'BT /F1 8 Tf 1 0 0 rg (x) Tj ET', '0 0 0 rg', '0 0 0 rg']
+        self.assertEqual(compact_operators(code),
+                         ['0 0 0 rg', 'BT /F1 8 Tf 1 0 0 rg (x) Tj ET', '0 0 0 rg'])
+
+    def test_untracked_operator_clears_state(self):
+        code = ['0 0 0 rg', '/GS1 gs', '0 0 0 rg']
+        self.assertEqual(compact_operators(code), code)
+
+    def test_consecutive_grid_lines_merge(self):
+        code = ['n 0 0 m 10 0 l S', 'n 0 5 m 10 5 l S', '1 w',
+                'n 0 9 m 10 9 l S', '0 0 m 5 5 l S']
+        self.assertEqual(compact_operators(code), ['0 0 m 10 0 l 0 5 m 10 5 l S', '1 w',
+                                                   '0 9 m 10 9 l S', '0 0 m 5 5 l S'])
+
+    def test_trailing_grid_lines_are_flushed(self):
+        self.assertEqual(compact_operators(['q', 'n 0 0 m 1 1 l S', 'n 1 1 m 2 2 l S']),
+                         ['q', '0 0 m 1 1 l 1 1 m 2 2 l S'])
+
+    def test_next_line_removed_only_at_end_of_text(self):
+        code = ['BT 1 0 0 1 5 5 Tm (a) Tj T* (b) Tj T* ET', 'BT (c) Tj T* (d) Tj ET', 'T*']
+        self.assertEqual(compact_operators(code),
+                         ['BT 1 0 0 1 5 5 Tm (a) Tj T* (b) Tj ET', 'BT (c) Tj T* (d) Tj ET', 'T*'])
+
+
+if __name__ == '__main__':
+    unittest.main()
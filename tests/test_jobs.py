@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from api.jobs import LEASE_SECONDS, RETRY_DELAY, JobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'jobs.sqlite3')
+        self.now = 1000.0
+        clock = mock.patch('api.jobs.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.queue = JobQueue(self.path, max_attempts=3, ttl=100)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_claim_and_complete(self):
+        first = self.queue.submit({'trips': [1]}, {'engine': 'canvas'})
+        self.now += 1
+        second = self.queue.submit({'trips': [2]})
+        self.assertEqual(self.queue.claim(), (first, {'trips': [1]}, {'engine': 'canvas'}))
+        self.assertEqual(self.queue.claim(), (second, {'trips': [2]}, {}))
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.status(first)['status'], 'running')
+
+        self.queue.complete(first, b'%PDF', pages=2)
+        job, pdf = self.queue.artifact(first)
+        self.assertEqual((job['status'], job['pages'], job['bytes'], pdf), ('done', 2, 4, b'%PDF'))
+        self.assertEqual(self.queue.counts(), {'done': 1, 'running': 1})
+        self.assertEqual(self.queue.artifact('unknown'), (None, None))
+
+    def test_expired_lease_is_taken_over(self):
+        job_id = self.queue.submit({})
+        self.queue.claim()
+        self.now += LEASE_SECONDS - 1
+        self.assertIsNone(self.queue.claim())
+        self.now += 2
+        self.assertEqual(self.queue.claim()[0], job_id)
+        self.assertEqual(self.queue.status(job_id)['attempts'], 2)
+
+    def test_worker_lost_on_last_attempt(self):
+        queue = JobQueue(self.path, max_attempts=1, ttl=100)
+        job_id = queue.submit({})
+        queue.claim()
+        self.now += LEASE_SECONDS + 1
+        self.assertIsNone(queue.claim())
+        status = queue.status(job_id)
+        self.assertEqual((status['status'], status['error']), ('failed', 'worker lost'))
+
+    def test_retry_backoff(self):
+        job_id = self.queue.submit({})
+        self.queue.claim()
+        self.queue.fail(job_id, 'boom')
+        status = self.queue.status(job_id)
+        self.assertEqual((status['status'], status['error']), ('queued', 'boom'))
+        self.now += RETRY_DELAY - 1
+        self.assertIsNone(self.queue.claim())
+        self.now += 1
+        self.assertEqual(self.queue.claim()[0], job_id)
+
+        # The second failure waits twice as long.
+        self.queue.fail(job_id, 'boom')
+        self.now += 2 * RETRY_DELAY - 1
+        self.assertIsNone(self.queue.claim())
+        self.now += 1
+        self.assertEqual(self.queue.claim()[0], job_id)
+
+        # The third is the last attempt.
+        self.queue.fail(job_id, 'boom')
+        self.assertEqual(self.queue.status(job_id)['status'], 'failed')
+        self.now += 1000
+        self.assertIsNone(self.queue.claim())
+
+    def test_permanent_failure(self):
+        job_id = self.queue.submit({})
+        self.queue.claim()
+        self.queue.fail(job_id, 'ValueError: bad payload', permanent=True)
+        status = self.queue.status(job_id)
+        self.assertEqual((status['status'], status['attempts']), ('failed', 1))
+        self.queue.fail('unknown', 'boom')
+
+    def test_two_stage_expiry(self):
+        job_id = self.queue.submit({})
+        self.queue.claim()
+        self.queue.complete(job_id, b'%PDF')
+        self.assertEqual(self.queue.expire(self.now + 99), 0)
+
+        # The PDF goes first; the status stays visible for another TTL.
+        self.assertEqual(self.queue.expire(self.now + 100), 1)
+        job, pdf = self.queue.artifact(job_id)
+        self.assertEqual((job['status'], pdf), ('expired', None))
+        self.assertEqual(self.queue.expire(self.now + 199), 0)
+        self.assertIsNotNone(self.queue.status(job_id))
+        self.queue.expire(self.now + 200)
+        self.assertIsNone(self.queue.status(job_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from api.index import PDFGenerator
+from api.ledger import Entry, Ledger, statement_key
+from bench import benchmarks, coldstart
+
+
+def payload(truck, date, amount, ytd=None):
+    data = {'statement_info': {'truck_number': truck, 'date': date, 'week_period': '12.01-12.07'},
+            'trips': [{'quantity': amount, 'rate': 1}], 'deductions': [{'amount': -10}]}
+    if ytd is not None:
+        data['ytd'] = ytd
+    return data
+
+
+class LedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'ledger.sqlite3')
+        self.ledger = Ledger(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_statement_key(self):
+        self.assertEqual(statement_key({'truck_number': 196, 'date': '12/12/2025'}), ('196', '2025-12-12'))
+        self.assertEqual(statement_key({'truck_number': '7', 'date': '1/2/25'}), ('7', '2025-01-02'))
+        self.assertIsNone(statement_key({'truck_number': '', 'date': '12/12/2025'}))
+        self.assertIsNone(statement_key({'truck_number': '7', 'date': 'someday'}))
+
+    def test_running_totals(self):
+        self.ledger.record(Entry('7', '2025-01-10', 10000, 9000, 1))
+        self.ledger.record(Entry('7', '2025-01-17', 20000, 19000, 2))
+        self.ledger.record(Entry('8', '2025-01-17', 500, 500, 1))
+        self.assertEqual(self.ledger.ytd(Entry('7', '2025-01-24', 100, 100, 1)), (30100, 28100))
+        # A new year starts from zero.
+        self.assertEqual(self.ledger.ytd(Entry('7', '2026-01-02', 100, 100, 1)), (100, 100))
+        self.assertEqual(self.ledger.verify(), [])
+
+    def test_out_of_order_and_replaced(self):
+        self.ledger.record(Entry('7', '2025-01-17', 20000, 19000, 2))
+        self.ledger.record(Entry('7', '2025-01-10', 10000, 9000, 1))
+        self.assertEqual([row['ytd_gross'] for row in self.ledger.statements('7')], [10000, 30000])
+        self.ledger.record(Entry('7', '2025-01-10', 15000, 14000, 1))
+        self.assertEqual([row['ytd_gross'] for row in self.ledger.statements('7')], [15000, 35000])
+        self.assertEqual(len(self.ledger.statements('7', 2025)), 2)
+        self.assertEqual(self.ledger.verify(), [])
+
+    def test_rebuild(self):
+        self.ledger.record(Entry('9', '2025-03-01', 1, 1, 1))
+        count = self.ledger.rebuild([Entry('7', '2025-01-17', 200, 190, 2), Entry('7', '2025-01-10', 100, 90, 1)])
+        self.assertEqual(count, 2)
+        self.assertEqual(self.ledger.statements('9'), [])
+        self.assertEqual(self.ledger.lookup('7', '2025-01-17')['ytd_net'], 280)
+        self.assertEqual(self.ledger.verify(), [])
+
+    def test_generator_fills_ytd_and_records(self):
+        PDFGenerator(io.BytesIO(), ledger=self.ledger).generate(payload('7', '01/10/2025', 100))
+        generator = PDFGenerator(None, ledger=self.ledger)
+        content, _ = generator.prepare(payload('7', '01/17/2025', 50))
+        self.assertEqual(content['ytd_source'], 'ledger')
+        self.assertEqual((content['ytd_gross'], content['ytd_net']), (15000, 13000))
+        # A payload that sends its YTD figures is printed as sent.
+        content, _ = generator.prepare(payload('7', '01/17/2025', 50, ytd={'net': 1, 'gross': 2}))
+        self.assertEqual((content['ytd_source'], content['ytd_gross']), ('payload', 200))
+
+    def test_generator_leaves_ledger_alone_by_default(self):
+        with mock.patch.dict(os.environ, {'STATEMENT_LEDGER_DB': self.path}):
+            generator = PDFGenerator(io.BytesIO())
+            generator.generate(payload('196', '12/12/2025', 100))
+        self.assertEqual(self.ledger.statements('196'), [])
+
+    def test_benchmarks_leave_ledger_alone(self):
+        # The handler path records what it issues; the benchmark children
+        # run it without the ledger.
+        with mock.patch.dict(os.environ, {'STATEMENT_LEDGER_DB': self.path}):
+            benchmarks.spawn_case('handler', 'platypus', 3, 1, 1)
+            coldstart.run_probe('platypus')
+        self.assertEqual(self.ledger.statements('196'), [])
+        self.assertEqual(self.ledger.statements('cold-0'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
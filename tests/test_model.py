@@ -0,0 +1,142 @@
+import unittest
+
+from api.model import (MAX_MAGNITUDE, QUANTITY_SCALE, RATE_SCALE, InvalidStatement, StatementModel,
+                       _round_div, check_statement, format_cents, format_fixed, to_cents, to_fixed)
+
+
+class RoundDivTest(unittest.TestCase):
+    def test_exact(self):
+        self.assertEqual(_round_div(300, 100), 3)
+        self.assertEqual(_round_div(-300, 100), -3)
+        self.assertEqual(_round_div(0, 100), 0)
+
+    def test_half_rounds_away_from_zero(self):
+        self.assertEqual(_round_div(5, 10), 1)
+        self.assertEqual(_round_div(-5, 10), -1)
+        self.assertEqual(_round_div(15, 10), 2)
+        self.assertEqual(_round_div(-15, 10), -2)
+
+    def test_below_half_rounds_toward_zero(self):
+        self.assertEqual(_round_div(4, 10), 0)
+        self.assertEqual(_round_div(-4, 10), 0)
+        self.assertEqual(_round_div(149, 100), 1)
+        self.assertEqual(_round_div(-149, 100), -1)
+
+    def test_odd_divisor(self):
+        self.assertEqual(_round_div(1, 3), 0)
+        self.assertEqual(_round_div(2, 3), 1)
+        self.assertEqual(_round_div(-2, 3), -1)
+
+
+class ToFixedTest(unittest.TestCase):
+    def test_ints_and_strings(self):
+        self.assertEqual(to_cents(12), 1200)
+        self.assertEqual(to_cents(-37), -3700)
+        self.assertEqual(to_cents('2000.00'), 200000)
+        self.assertEqual(to_cents(' 12.5 '), 1250)
+        self.assertEqual(to_fixed('0.3', RATE_SCALE), 3000)
+
+    def test_floats_use_their_repr(self):
+        # 0.285 and 1.005 are just below the half cent as binary floats;
+        # the shortest repr is what the user typed, and that rounds up.
+        self.assertEqual(to_cents(0.285), 29)
+        self.assertEqual(to_cents(1.005), 101)
+        self.assertEqual(to_cents(-2.675), -268)
+        self.assertEqual(to_cents(0.1) + to_cents(0.2), to_cents(0.3))
+        self.assertEqual(to_cents(1e-7), 0)
+
+    def test_half_cent_rounding(self):
+        self.assertEqual(to_cents('0.005'), 1)
+        self.assertEqual(to_cents('-0.005'), -1)
+        self.assertEqual(to_cents('0.0049'), 0)
+        self.assertEqual(to_fixed('0.00005', QUANTITY_SCALE), 1)
+
+    def test_bad_inputs(self):
+        for value in ('abc', '', None, [1], {}, '1,000.00', float('nan'), float('inf'), '-inf'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    to_cents(value)
+
+    def test_magnitude_limit(self):
+        self.assertEqual(to_cents(MAX_MAGNITUDE), MAX_MAGNITUDE * 100)
+        self.assertEqual(to_cents(-MAX_MAGNITUDE), -MAX_MAGNITUDE * 100)
+        for value in (MAX_MAGNITUDE + 1, -MAX_MAGNITUDE - 1, '1e9', 1e300, 10 ** 30):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    to_cents(value)
+
+
+class FormatTest(unittest.TestCase):
+    def test_format_cents(self):
+        self.assertEqual(format_cents(0), '$0.00')
+        self.assertEqual(format_cents(5), '$0.05')
+        self.assertEqual(format_cents(260250), '$2,602.50')
+        self.assertEqual(format_cents(123456789), '$1,234,567.89')
+
+    def test_format_cents_negative(self):
+        self.assertEqual(format_cents(-3750), '($37.50)')
+        self.assertEqual(format_cents(-1), '($0.01)')
+        self.assertEqual(format_cents(-123456789), '($1,234,567.89)')
+
+    def test_format_fixed(self):
+        self.assertEqual(format_fixed(20000000, QUANTITY_SCALE, 2), '2000.00')
+        self.assertEqual(format_fixed(3000, RATE_SCALE, 4), '0.3000')
+        self.assertEqual(format_fixed(50, QUANTITY_SCALE, 2), '0.01')
+        self.assertEqual(format_fixed(-50, QUANTITY_SCALE, 2), '-0.01')
+        self.assertEqual(format_fixed(-49, QUANTITY_SCALE, 2), '0.00')
+        self.assertEqual(format_fixed(12345, 1, 0), '12345')
+
+
+class StatementModelTest(unittest.TestCase):
+    def test_amounts_are_quantity_times_rate(self):
+        model = StatementModel({
+            'trips': [{'quantity': 2000, 'rate': 0.3, 'amount': 1},
+                      {'quantity': '1234.56', 'rate': '0.3333'}],
+            'deductions': [{'amount': -37.5}],
+            'ytd': {'net': 22801.41, 'gross': '28826.40'},
+        })
+        self.assertEqual(list(model.trip_amounts), [60000, 41148])
+        self.assertEqual(model.total_trips, 101148)
+        self.assertEqual(model.total_deductions, -3750)
+        self.assertEqual(model.check_amount, 97398)
+        self.assertEqual((model.ytd_net, model.ytd_gross), (2280141, 2882640))
+
+    def test_bad_values_are_zero(self):
+        model = StatementModel({
+            'trips': [{'quantity': 'x', 'rate': 0.3}, {'quantity': 10, 'rate': 1e12}],
+            'deductions': [{'amount': 'n/a'}],
+            'ytd': {'net': None},
+        })
+        self.assertEqual(list(model.trip_amounts), [0, 0])
+        self.assertEqual(list(model.deduction_amounts), [0])
+        self.assertEqual(model.ytd_net, 0)
+
+    def test_rows(self):
+        model = StatementModel({'trips': [{'date': '12/01/25', 'trip_number': '1', 'route': 'A-B',
+                                           'description': 'd', 'quantity': 2000, 'rate': 0.3}],
+                                'deductions': [{'description': 'INS', 'date': '12/04/25', 'amount': -37.5}]})
+        self.assertEqual(model.trip_rows(), [['12/01/25', '1', 'A-B', 'd', '2000.00', '0.3000', '$600.00']])
+        self.assertEqual(model.deduction_rows(), [['INS', '12/04/25', '($37.50)']])
+
+    def test_rows_are_strings(self):
+        model = StatementModel({'trips': [{'route': ['a', 'b'], 'trip_number': 7, 'quantity': 1, 'rate': 1}],
+                                'deductions': [{'description': {'x': 1}, 'date': None, 'amount': -1}]})
+        self.assertEqual(model.trip_rows(), [['', '7', "['a', 'b']", '', '1.00', '1.0000', '$1.00']])
+        self.assertEqual(model.deduction_rows(), [["{'x': 1}", 'None', '($1.00)']])
+
+
+class CheckStatementTest(unittest.TestCase):
+    def test_valid_shapes(self):
+        check_statement({})
+        check_statement({'trips': [], 'deductions': [{}], 'ytd': {}, 'recipient': {}, 'statement_info': {}})
+
+    def test_invalid_shapes(self):
+        for data in (5, 'x', None, [], {'trips': 'abc'}, {'trips': [1]}, {'trips': None},
+                     {'deductions': {}}, {'ytd': None}, {'recipient': []}, {'statement_info': 'x'}):
+            with self.subTest(data=data):
+                with self.assertRaises(InvalidStatement):
+                    check_statement(data)
+
+
+if __name__ == '__main__':
+    unittest.main()